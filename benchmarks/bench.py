@@ -0,0 +1,403 @@
+# *_*coding:utf-8 *_*
+"""Throughput and peak memory of the fetch, insert and export hot paths
+
+Every case runs against the in-process MySQL stand-in, which exercises the
+client side of the backend: statement building, escaping and Dataframe
+encoding. The network, the server and pymysql's packet decoding are left
+out, the stand-in hands out ready-made tuples, so its reads are labelled
+``no-decode`` and only time building frames, Arrow tables and CSV from
+them. Setting a URL runs the same cases against a server, e.g. one started
+with docker::
+
+    SQLSTAR_BENCH_MYSQL_URL=mysql://root:pw@127.0.0.1:3306/bench
+    SQLSTAR_BENCH_POSTGRE_URL=postgre://postgres:pw@127.0.0.1:5432/bench
+
+Keep a baseline of a release and check later runs against it, the run
+fails when a case loses more than the tolerance in rows/s or grows its
+peak memory beyond it::
+
+    python benchmarks/bench.py --save ~/sqlstar-3.2.5.json
+    python benchmarks/bench.py --compare ~/sqlstar-3.2.5.json
+
+Timings only compare on the same machine, so baselines aren't committed:
+save one locally, on a quiet machine with a few cores, and compare there.
+The run warns when the baseline was saved on another platform or python.
+"""
+import argparse
+import datetime
+import fnmatch
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import sqlstar  # noqa: E402
+from sqlstar.log import logger  # noqa: E402
+
+SERVER_URLS = {
+    "mysql": "SQLSTAR_BENCH_MYSQL_URL",
+    "postgre": "SQLSTAR_BENCH_POSTGRE_URL",
+}
+TABLE = "sqlstar_bench"
+# column types of the postgre target by dtype kind, create_table of the
+# Postgres backend emits MySQL DDL
+POSTGRE_TYPES = {
+    "i": "BIGINT",
+    "f": "DOUBLE PRECISION",
+    "b": "BOOLEAN",
+    "M": "TIMESTAMP",
+}
+# statements run by the point lookup cases
+LOOKUPS = 1000
+
+
+def make_frame(kind: str, rows: int, seed: int = 0) -> pd.DataFrame:
+    """Deterministic frames of the shapes pipelines insert
+
+    :param kind: 'narrow' (4 typed columns), 'wide' (60 numeric columns),
+                 'strings' (6 text columns) or 'nulls' (half missing)
+    """
+    rng = np.random.default_rng(seed)
+    if kind == "narrow":
+        return pd.DataFrame({
+            "uid": np.arange(rows, dtype="int64"),
+            "amount": rng.random(rows) * 1000,
+            "flag": rng.random(rows) > 0.5,
+            "created": pd.Timestamp("2024-01-01") +
+            pd.to_timedelta(rng.integers(0, 10**7, rows), unit="s"),
+        })
+    if kind == "wide":
+        columns = {"uid": np.arange(rows, dtype="int64")}
+        for i in range(30):
+            columns[f"i{i}"] = rng.integers(0, 10**6, rows)
+            columns[f"f{i}"] = rng.random(rows)
+        return pd.DataFrame(columns)
+    if kind == "strings":
+        words = np.array([
+            "".join(chr(97 + c) for c in rng.integers(0, 26, length))
+            for length in rng.integers(8, 60, 1000)
+        ], dtype=object)
+        columns = {"uid": np.arange(rows, dtype="int64")}
+        for i in range(6):
+            columns[f"s{i}"] = words[rng.integers(0, len(words), rows)]
+        return pd.DataFrame(columns)
+    if kind == "nulls":
+        df = make_frame("narrow", rows, seed)
+        df["label"] = pd.Series(
+            rng.choice(np.array(["a", "bb", "ccc"], dtype=object), rows))
+        mask = rng.random((rows, 4)) < 0.5
+        for i, column in enumerate(["amount", "flag", "created", "label"]):
+            df[column] = df[column].astype(object).where(~mask[:, i], None)
+        return df
+    raise ValueError(f"Unknown frame: {kind}")
+
+
+class Target:
+    """A database the cases run against, the stand-in or a server"""
+
+    def __init__(self, name: str, url: str, standin=None):
+        self.name = name
+        self.url = url
+        self.standin = standin
+        self.db = None
+
+    def __enter__(self):
+        if self.standin is not None:
+            self._installed = self.standin.installed()
+            self._installed.__enter__()
+        self.db = sqlstar.Database(self.url)
+        self.db.connect()
+        return self
+
+    def __exit__(self, *args):
+        self.drop()
+        self.db.disconnect()
+        if self.standin is not None:
+            self._installed.__exit__(*args)
+
+    def drop(self) -> None:
+        self.db.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+    def reset(self, df: pd.DataFrame = None) -> None:
+        """Recreate the table, typed after `df`"""
+        self.drop()
+        if self.name != "postgre":
+            self.db.create_table(TABLE, df, primary_key="uid")
+            return
+        columns = ", ".join(
+            f"{name} {POSTGRE_TYPES.get(dtype.kind, 'TEXT')}"
+            for name, dtype in df.infer_objects().dtypes.items())
+        self.db.execute(
+            f"CREATE TABLE {TABLE} ({columns}, PRIMARY KEY (uid))")
+
+    def fill(self, df: pd.DataFrame) -> None:
+        """Make `df` the content of the table"""
+        self.reset(df)
+        self.db.insert_df(TABLE, df)
+        if self.standin is not None:
+            from pymysql.constants import FIELD_TYPE
+            types = {
+                "i": FIELD_TYPE.LONGLONG,
+                "f": FIELD_TYPE.DOUBLE,
+                "b": FIELD_TYPE.TINY,
+                "M": FIELD_TYPE.DATETIME
+            }
+            columns = [(name, types.get(dtype.kind, FIELD_TYPE.VAR_STRING))
+                       for name, dtype in df.dtypes.items()]
+            # rows as pymysql decodes them, booleans come back as TINYINT
+            df = df.astype({
+                name: "int64"
+                for name, dtype in df.dtypes.items() if dtype.kind == "b"
+            })
+            df = df.astype(object).where(df.notna(), None)
+            df = df.apply(lambda column: column.map(
+                lambda value: value.to_pydatetime()
+                if isinstance(value, pd.Timestamp) else value))
+            rows = list(df.itertuples(index=False, name=None))
+            self.standin.result(columns, rows)
+
+
+def cases(target: Target, rows: int) -> dict:
+    """name -> (setup, run), `run` returns the rows it processed"""
+    frames = {}
+
+    def frame(kind):
+        if kind not in frames:
+            frames[kind] = make_frame(kind, rows)
+        return frames[kind]
+
+    db = target.db
+    found = {}
+
+    def insert_df(kind):
+        db.insert_df(TABLE, frame(kind))
+        return len(frame(kind))
+
+    for kind in ("narrow", "wide", "strings", "nulls"):
+        found[f"insert_df[{kind}]"] = (
+            lambda kind=kind: target.reset(frame(kind)),
+            lambda kind=kind: insert_df(kind))
+
+    def insert_many():
+        df = frame("narrow")
+        data = list(
+            df.astype(object).itertuples(index=False, name=None))
+        db.insert_many(TABLE, data, df.columns.tolist())
+        return len(data)
+
+    found["insert_many"] = (lambda: target.reset(frame("narrow")),
+                            insert_many)
+
+    def create_table():
+        # type inference scans every column, rows/s is columns/s here
+        db.create_table(TABLE, frame("wide"), primary_key="uid")
+        return frame("wide").shape[1]
+
+    if target.name != "postgre":
+        found["create_table[wide]"] = (target.drop, create_table)
+
+    def read(name, *tags):
+        """Name of a read case, tagged when rows aren't decoded"""
+        if target.standin is not None:
+            tags += ("no-decode", )
+        return f"{name}[{','.join(tags)}]" if tags else name
+
+    select = f"SELECT * FROM {TABLE}"
+    fill = lambda: target.fill(frame("narrow"))  # noqa: E731
+    if target.standin is None:
+        # on the stand-in, this would only time slicing a tuple
+        found["fetch_all"] = (fill, lambda: len(db.fetch_all(select)))
+    found[read("fetch_df")] = (fill, lambda: len(db.fetch_df(select)))
+    found[read("fetch_df", "arrow")] = (
+        fill, lambda: len(db.fetch_df(select, engine="arrow")))
+
+    if target.name == "postgre":
+        # only psycopg runs server-side prepared statements, pymysql speaks
+        # the text protocol and ignores prepare
+        point = f"SELECT * FROM {TABLE} WHERE uid = %s"
+
+        def lookups(prepare):
+            for uid in range(LOOKUPS):
+                db.fetch_all(point, (uid, ), prepare=prepare)
+            return LOOKUPS
+
+        found["fetch_all[point]"] = (fill, lambda: lookups(False))
+        found["fetch_all[point,prepare]"] = (fill, lambda: lookups(True))
+
+    def export_csv():
+        with tempfile.TemporaryDirectory() as directory:
+            return db.export_csv(select, os.path.join(directory,
+                                                      "bench.csv")).rows
+
+    found[read("export_csv")] = (fill, export_csv)
+    return found
+
+
+# fast cases run again until they add up to this many seconds, so their
+# best time isn't noise
+MIN_SECONDS = 0.5
+MAX_RUNS = 100
+
+
+def measure(setup, run, repeat: int) -> dict:
+    """Best of at least `repeat` timed runs, and the tracemalloc peak of
+    one more
+    """
+    best, processed, elapsed, runs = float("inf"), 0, 0.0, 0
+    while runs < repeat or (elapsed < MIN_SECONDS and runs < MAX_RUNS):
+        setup()
+        # like timeit, a collection triggered by an earlier case would
+        # otherwise be billed to this one
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            processed = run()
+            seconds = time.perf_counter() - started
+        finally:
+            gc.enable()
+        best = min(best, seconds)
+        elapsed += seconds
+        runs += 1
+    setup()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "rows": processed,
+        "seconds": best,
+        "rows_per_s": processed / best if best else 0.0,
+        "peak_bytes": peak,
+    }
+
+
+def targets() -> list:
+    from sqlstar.testing import StandIn
+
+    found = [Target("standin", "mysql://bench@127.0.0.1:3306/bench",
+                    StandIn())]
+    for scheme, variable in SERVER_URLS.items():
+        if os.environ.get(variable):
+            found.append(Target(scheme, os.environ[variable]))
+    return found
+
+
+def run(rows: int, repeat: int, pattern: str = "*") -> dict:
+    results = {}
+    for target in targets():
+        with target:
+            for name, (setup, call) in cases(target, rows).items():
+                key = f"{target.name}/{name}"
+                if not fnmatch.fnmatch(key, pattern):
+                    continue
+                results[key] = measure(setup, call, repeat)
+                result = results[key]
+                print(f"{key:<32} {result['rows_per_s']:>12,.0f} rows/s "
+                      f"{result['peak_bytes'] / 1024**2:>9.1f} MiB peak")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float,
+            memory_tolerance: float) -> list:
+    """Regressions of `results` against a saved baseline
+
+    :return: one message per case slower or hungrier than tolerated
+    """
+    regressions = []
+    for key, old in baseline["results"].items():
+        new = results.get(key)
+        if new is None:
+            continue
+        if new["rows_per_s"] < old["rows_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: {new['rows_per_s']:,.0f} rows/s, baseline "
+                f"{old['rows_per_s']:,.0f} "
+                f"({new['rows_per_s'] / old['rows_per_s'] - 1:+.0%})")
+        if new["peak_bytes"] > old["peak_bytes"] * (1 + memory_tolerance):
+            regressions.append(
+                f"{key}: peak {new['peak_bytes'] / 1024**2:.1f} MiB, "
+                f"baseline {old['peak_bytes'] / 1024**2:.1f} MiB "
+                f"({new['peak_bytes'] / old['peak_bytes'] - 1:+.0%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-k",
+                        "--filter",
+                        default="*",
+                        help="glob of the cases to run, e.g. '*/insert_df*'")
+    parser.add_argument("--save", help="write the results as a baseline")
+    parser.add_argument("--compare", help="baseline to check against")
+    parser.add_argument("--tolerance",
+                        type=float,
+                        default=0.15,
+                        help="rows/s drop tolerated, 0.15 is 15%%")
+    parser.add_argument("--memory-tolerance",
+                        type=float,
+                        default=0.25,
+                        help="peak memory growth tolerated")
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    results = run(args.rows, args.repeat, args.filter)
+
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "sqlstar": sqlstar.__version__,
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "rows": args.rows,
+                        "created": datetime.datetime.now().isoformat(
+                            timespec="seconds"),
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2)
+        print(f"baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("rows") != args.rows:
+            print(f"warning: baseline ran {baseline['meta'].get('rows')} "
+                  f"rows, this run {args.rows}")
+        for key, value in (("python", platform.python_version()),
+                           ("platform", platform.platform())):
+            if baseline["meta"].get(key) != value:
+                print(f"warning: baseline ran on {key} "
+                      f"{baseline['meta'].get(key)}, this run {value}")
+        regressions = compare(results, baseline, args.tolerance,
+                              args.memory_tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print(f"no regression against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
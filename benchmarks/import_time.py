@@ -0,0 +1,71 @@
+# *_*coding:utf-8 *_*
+"""Guard the cost of ``import sqlstar``
+
+Every run imports the package in a fresh interpreter, checks that none of
+the heavy dependencies came along and that the median import time stays
+within the budget. Exits non zero otherwise, so it can gate CI::
+
+    python benchmarks/import_time.py --budget 150
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# loaded on first use only: DataFrame methods, backends, the cli
+LAZY_MODULES = ("pandas", "numpy", "pyarrow", "polars", "click", "loguru",
+                "pymysql", "aiomysql", "psycopg", "xlsxwriter", "asyncio")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import sqlstar
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure(runs: int = 10) -> dict:
+    """Import sqlstar `runs` times, each in a new interpreter
+
+    :return: {"ms": [timings], "loaded": heavy modules found loaded}
+    """
+    timings, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE],
+                             check=True,
+                             capture_output=True,
+                             text=True).stdout
+        result = json.loads(out)
+        timings.append(result["ms"])
+        loaded.update(
+            name for name in LAZY_MODULES if name in result["modules"])
+    return {"ms": timings, "loaded": sorted(loaded)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget",
+                        type=float,
+                        default=150.0,
+                        help="median milliseconds allowed")
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    median = statistics.median(result["ms"])
+    print(f"import sqlstar: median {median:.1f}ms, "
+          f"min {min(result['ms']):.1f}ms over {args.runs} runs")
+    failed = False
+    if result["loaded"]:
+        print(f"FAIL: imported eagerly: {', '.join(result['loaded'])}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL: median above the {args.budget:.0f}ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
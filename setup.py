@@ -61,11 +61,15 @@ setup(
     description=DESCRIPTION,
     long_description=get_long_description(),
     long_description_content_type="text/markdown",
-    python_requires=">=3.5.0",
+    python_requires=">=3.7.0",
     packages=find_packages(exclude=["examples"]),
     package_data={NAME: ["*"]},
     data_files=[("", ["LICENSE"])],
     install_requires=read_requirements("requirements.txt"),
+    extras_require={
+        "async": ["aiomysql"],
+        "excel": ["xlsxwriter"],
+    },
     include_package_data=True,
     entry_points={
         "console_scripts": [
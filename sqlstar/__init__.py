@@ -1,15 +1,14 @@
 # *_*coding:utf-8 *_*
-import sys
-from loguru import logger
-
-from sqlstar.core import Database, DatabaseURL
+from sqlstar.core import AsyncDatabase, Database, DatabaseURL
 from .__version__ import version, __version__
 
-logger.remove()
-logger.add(
-    sys.stderr,
-    format=
-    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> | <cyan>{file}:{line}</cyan> - <level>{message}</level>"
-)
 
-__all__ = ["Database", "DatabaseURL"]
+def __getattr__(name):
+    # `sqlstar.logger` configures loguru, only pay for it once it's used
+    if name == "logger":
+        from sqlstar.log import logger
+        return logger
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["AsyncDatabase", "Database", "DatabaseURL"]
@@ -0,0 +1,126 @@
+# *_*coding:utf-8 *_*
+import typing
+
+from sqlstar.utils import decoding, description_columns, fetch_batches
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Arrow results need pyarrow, `pip install pyarrow`")
+    return pyarrow
+
+
+def arrow_types(description, type_factories: dict) -> list:
+    """Arrow type of every column of a cursor description
+
+    :param type_factories: driver type code -> callable taking the pyarrow
+                           module and the description column, and returning
+                           a type or None; codes not listed are inferred
+                           from the values
+    :return: list of pyarrow types, None where it has to be inferred
+    """
+    pa = import_pyarrow()
+    types = []
+    for column in description or ():
+        factory = type_factories.get(column[1])
+        types.append(factory(pa, column) if factory is not None else None)
+    return types
+
+
+def decimal_type(pa, column):
+    """Type of a DECIMAL/numeric column, from the precision and scale of its
+    description, None when they aren't declared (Postgres' plain numeric)
+
+    MySQL reports the display length as precision, the sign and the point
+    included, a digit or two more than declared.
+    """
+    precision, scale = column[4], column[5]
+    if not precision or scale is None:
+        return None
+    precision = max(precision, scale + 1)
+    if precision <= 38:
+        return pa.decimal128(precision, scale)
+    return pa.decimal256(min(precision, 76), scale)
+
+
+def widen_type(current, found):
+    """Type holding the values of both `current` and `found`, e.g. float64
+    for int64 and float64
+
+    Decimals get the largest precision of their width, so that wider values
+    of later batches still fit.
+    """
+    pa = import_pyarrow()
+    if current is not None and not pa.types.is_null(current):
+        if pa.types.is_null(found) or found == current:
+            return current
+        schemas = [pa.schema([("c", current)]), pa.schema([("c", found)])]
+        try:
+            found = pa.unify_schemas(schemas,
+                                     promote_options="permissive")[0].type
+        except TypeError:
+            # pyarrow < 14 only promotes null columns
+            found = pa.unify_schemas(schemas)[0].type
+    if pa.types.is_decimal(found):
+        if found.precision <= 38:
+            return pa.decimal128(38, found.scale)
+        return pa.decimal256(76, found.scale)
+    return found
+
+
+def record_batches(cursor, batch_size: int,
+                   type_factories: dict) -> typing.Iterator:
+    """Build Arrow record batches straight from cursor batches
+
+    Values go from the driver's row tuples into Arrow buffers without an
+    intermediate Dataframe. Types come from the cursor description, DECIMAL
+    and numeric columns included. The other columns are inferred batch by
+    batch and widened to hold every batch so far, never narrowed, so a
+    later batch may have a wider type than an earlier one, `to_table`
+    promotes them. An empty result yields a single empty batch.
+    """
+    pa = import_pyarrow()
+    columns = description_columns(cursor.description)
+    declared = arrow_types(cursor.description, type_factories)
+    # types of the undeclared columns, widened over the batches so far
+    inferred = list(declared)
+    empty = True
+    for rows in fetch_batches(cursor, batch_size):
+        empty = False
+        with decoding():
+            arrays = []
+            for i, values in enumerate(zip(*rows)):
+                if declared[i] is not None:
+                    arrays.append(pa.array(values, type=declared[i]))
+                    continue
+                array = pa.array(values)
+                inferred[i] = widen_type(inferred[i], array.type)
+                if array.type != inferred[i]:
+                    array = array.cast(inferred[i])
+                arrays.append(array)
+            batch = pa.RecordBatch.from_arrays(arrays, names=columns)
+        yield batch
+    if empty:
+        schema = pa.schema([
+            pa.field(name, dtype or pa.null())
+            for name, dtype in zip(columns, declared)
+        ])
+        yield pa.RecordBatch.from_arrays(
+            [pa.array([], type=field.type) for field in schema],
+            schema=schema)
+
+
+def to_table(batches: typing.Iterable):
+    """Collect record batches into a pyarrow.Table, columns of the leading
+    batches are promoted to the wider type found later, e.g. null to int64
+    or decimal128(38, 2) to decimal128(38, 4)
+    """
+    pa = import_pyarrow()
+    tables = [pa.Table.from_batches([batch]) for batch in batches]
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except TypeError:
+        # pyarrow < 14
+        return pa.concat_tables(tables, promote=True)
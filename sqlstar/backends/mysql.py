@@ -1,23 +1,79 @@
 # *_*coding:utf-8 *_*
 import getpass
 import re
+import os
 import sys
+import tempfile
+import time
 import traceback
+import weakref
+import contextlib
+import functools
 import typing
-import click
-import pandas as pd
 
 import warnings
 import pymysql
-from sqlstar import logger
+from pymysql.constants import CLIENT, FIELD_TYPE, SERVER_STATUS
+from sqlstar.log import logger
 
+from sqlstar.arrow import decimal_type, record_batches
 from sqlstar.core import DatabaseURL
+from sqlstar.exporters import get_writer, write_csv
 from sqlstar.interfaces import ConnectionBackend, DatabaseBackend
-from sqlstar.utils import check_dtype_mysql
+from sqlstar.pool import ConnectionPool, get_pool_kwargs
+from sqlstar.utils import (check_dtype_mysql, description_columns,
+                           description_dtypes, df_to_records, fetch_batches,
+                           iter_frames, iter_statements, load_data_field)
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
 
 warnings.filterwarnings('ignore')
 warnings.simplefilter('ignore')
 
+# bytes of max_allowed_packet kept free for the packet header and command
+PACKET_OVERHEAD = 1024
+# per connection table the 'update' LOAD DATA path loads into first
+LOAD_STAGE = "`sqlstar_load_stage`"
+
+# Arrow types by field type, decimals from their declared precision and
+# scale, string and blob columns are inferred as they may hold str or bytes
+FIELD_TYPE_ARROW = {
+    FIELD_TYPE.TINY: lambda pa, _: pa.int64(),
+    FIELD_TYPE.SHORT: lambda pa, _: pa.int64(),
+    FIELD_TYPE.INT24: lambda pa, _: pa.int64(),
+    FIELD_TYPE.LONG: lambda pa, _: pa.int64(),
+    FIELD_TYPE.LONGLONG: lambda pa, _: pa.int64(),
+    FIELD_TYPE.YEAR: lambda pa, _: pa.int64(),
+    FIELD_TYPE.FLOAT: lambda pa, _: pa.float64(),
+    FIELD_TYPE.DOUBLE: lambda pa, _: pa.float64(),
+    FIELD_TYPE.DATETIME: lambda pa, _: pa.timestamp("us"),
+    FIELD_TYPE.TIMESTAMP: lambda pa, _: pa.timestamp("us"),
+    FIELD_TYPE.DATE: lambda pa, _: pa.date32(),
+    FIELD_TYPE.TIME: lambda pa, _: pa.duration("us"),
+    FIELD_TYPE.JSON: lambda pa, _: pa.string(),
+    FIELD_TYPE.DECIMAL: decimal_type,
+    FIELD_TYPE.NEWDECIMAL: decimal_type,
+}
+
+# pandas dtypes which hold every value of a MySQL column, NULLs included,
+# other types (strings, DECIMAL, DATE, ...) stay as python objects
+FIELD_TYPE_DTYPES = {
+    FIELD_TYPE.TINY: "Int64",
+    FIELD_TYPE.SHORT: "Int64",
+    FIELD_TYPE.INT24: "Int64",
+    FIELD_TYPE.LONG: "Int64",
+    FIELD_TYPE.LONGLONG: "Int64",
+    FIELD_TYPE.YEAR: "Int64",
+    FIELD_TYPE.FLOAT: "float64",
+    FIELD_TYPE.DOUBLE: "float64",
+    FIELD_TYPE.DATETIME: "datetime64[ns]",
+    FIELD_TYPE.TIMESTAMP: "datetime64[ns]",
+    FIELD_TYPE.VARCHAR: "object",
+    FIELD_TYPE.VAR_STRING: "object",
+    FIELD_TYPE.STRING: "object",
+}
+
 
 class MySQLBackend(DatabaseBackend):
 
@@ -31,7 +87,9 @@ class MySQLBackend(DatabaseBackend):
         self._db = self._database_url.database
         self._autocommit = True
         self._options = options
-        self._connection = None
+        self._pool = None  # type: typing.Optional[ConnectionPool]
+        # max_allowed_packet of each pooled connection
+        self._packet_limits = weakref.WeakKeyDictionary()
 
     def _get_connection_kwargs(self) -> dict:
         url_options = self._database_url.options
@@ -42,12 +100,30 @@ class MySQLBackend(DatabaseBackend):
         if ssl is not None:
             kwargs["ssl"] = {"true": True, "false": False}[ssl.lower()]
 
+        # LOAD DATA LOCAL INFILE lets the server read client files, so it
+        # must be switched on explicitly
+        if self._flag("local_infile"):
+            kwargs["local_infile"] = True
+        # several statements per query let execute_many batch its round
+        # trips, but also let an injected statement run, so it's opt-in too
+        if self._flag("multi_statements"):
+            kwargs["client_flag"] = CLIENT.MULTI_STATEMENTS
+
         return kwargs
 
+    def _flag(self, name: str) -> bool:
+        """Boolean option given to Database or in the URL query"""
+        value = self._options.get(name,
+                                  self._database_url.options.get(name))
+        if isinstance(value, str):
+            value = {"true": True, "false": False}[value.lower()]
+        return bool(value)
+
     def connect(self) -> None:
-        assert self._connection is None, "DatabaseBackend is already running"
+        assert self._pool is None, "DatabaseBackend is already running"
         kwargs = self._get_connection_kwargs()
-        self._connection = pymysql.connect(
+        connect = functools.partial(
+            pymysql.connect,
             host=self._host,
             port=self._port,
             user=self._user,
@@ -57,38 +133,102 @@ class MySQLBackend(DatabaseBackend):
             # cursorclass=pymysql.cursors.DictCursor,
             **kwargs,
         )
+        self._pool = ConnectionPool(
+            connect,
+            check=lambda conn: conn.ping(reconnect=False),
+            close=lambda conn: conn.close(),
+            **get_pool_kwargs(self._database_url.options, self._options),
+        )
+        self._pool.open()
 
     def disconnect(self) -> None:
-        assert self._connection is not None, "DatabaseBackend is not running"
-        self._connection.cursor().close()
-        self._connection = None
+        assert self._pool is not None, "DatabaseBackend is not running"
+        self._pool.close()
+        self._pool = None
 
     def connection(self) -> "MySQLConnection":
-        return MySQLConnection(self, self._connection)
+        return MySQLConnection(self)
+
+    def pool_stats(self) -> dict:
+        assert self._pool is not None, "DatabaseBackend is not running"
+        return self._pool.get_stats()
 
 
 class MySQLConnection(ConnectionBackend):
 
-    def __init__(self, database: MySQLBackend, connection: pymysql.Connection):
+    def __init__(self, database: MySQLBackend):
         self._database = database
-        self._connection = connection
+        self._connection = None  # type: typing.Optional[pymysql.Connection]
+
+    def acquire(self) -> None:
+        """Check a connection out of the backend's pool"""
+        assert self._connection is None, "Connection is already acquired"
+        pool = self._database._pool
+        assert pool is not None, "DatabaseBackend is not running"
+        self._connection = pool.acquire()
+
+    def release(self) -> None:
+        """Give the connection back, connections which are closed or left
+        inside a transaction are dropped from the pool
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        connection, self._connection = self._connection, None
+        in_transaction = bool(connection.server_status
+                              & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+        self._database._pool.release(connection,
+                                     discard=not connection.open
+                                     or in_transaction)
+
+    def begin(self) -> None:
+        """Start a transaction on the autocommit connection"""
+        assert self._connection is not None, "Connection is not acquired"
+        self._connection.begin()
+
+    def commit(self) -> None:
+        assert self._connection is not None, "Connection is not acquired"
+        self._connection.commit()
+
+    def rollback(self) -> None:
+        assert self._connection is not None, "Connection is not acquired"
+        self._connection.rollback()
 
     @property
     def connection(self) -> pymysql.Connection:
         assert self._connection is not None, "Connection is not acquired"
         return self._connection
 
-    def fetch_all(self, query):
-        """Fetch all the rows"""
+    def fetch_all(self, query, params=None, prepare: bool = False):
+        """Fetch all the rows
+
+        :param params: sequence or dict bound to the %s / %(name)s
+                       placeholders of query
+        :param prepare: ignored, pymysql has no binary protocol to run
+                        server-side prepared statements with
+        """
         assert self._connection is not None, "Connection is not acquired"
         cursor = self._connection.cursor()
         try:
-            cursor.execute(query)
+            cursor.execute(query, params)
             result = cursor.fetchall()
             return result
         finally:
             cursor.close()
 
+    def explain(self, query, params=None) -> str:
+        """Plan of a statement, one line of EXPLAIN output per table"""
+        assert self._connection is not None, "Connection is not acquired"
+        cursor = self._connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN {query}", params)
+            columns = description_columns(cursor.description)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        return "\n".join(
+            ", ".join(f"{column}={value}"
+                      for column, value in zip(columns, row)
+                      if value is not None) for row in rows)
+
     def fetch_df(self, query: typing.Union[str], *args: typing.Any,
                  **kwargs: typing.Any):
         """Fetch data, and format result into Dataframe
@@ -97,23 +237,88 @@ class MySQLConnection(ConnectionBackend):
         :return: Dataframe
         """
         assert self._connection is not None, "Connection is not acquired"
+        import pandas as pd
 
         return pd.read_sql(query, self._connection, *args, **kwargs)
 
+    def fetch_df_iter(self,
+                      query: typing.Union[str],
+                      chunksize: int = 10000,
+                      dtype: dict = None,
+                      params=None):
+        """Stream the result as Dataframes of `chunksize` rows
+
+        :param query:
+        :param chunksize: rows per Dataframe
+        :param dtype: column -> dtype overriding the types derived from the
+                      cursor description
+        :param params: parameters bound to the query
+        :return: iterator of Dataframes sharing the same dtypes
+        """
+        with self._server_cursor(query, params) as cursor:
+            columns = description_columns(cursor.description)
+            dtypes = description_dtypes(cursor.description, FIELD_TYPE_DTYPES)
+            dtypes.update(dtype or {})
+            yield from iter_frames(cursor, columns, dtypes, chunksize)
+
+    def fetch_arrow_batches(self,
+                            query: typing.Union[str],
+                            batch_size: int = 10000,
+                            params=None):
+        """Stream the result as pyarrow.RecordBatch objects
+
+        :param query:
+        :param batch_size: rows per record batch
+        :param params: parameters bound to the query
+        :return: iterator of record batches sharing one schema
+        """
+        with self._server_cursor(query, params) as cursor:
+            yield from record_batches(cursor, batch_size, FIELD_TYPE_ARROW)
+
     def export_csv(self,
                    query: typing.Union[str],
                    fname: typing.Union[str],
-                   sep: typing.Any = ','):
-        """Export result to csv"""
-        df = self.fetch_df(query)
-        return df.to_csv(fname, sep=sep, encoding='utf-8', index=False)
+                   sep: typing.Any = ',',
+                   compression: typing.Optional[str] = "infer",
+                   batch_size: int = 10000,
+                   params=None):
+        """Export result to csv
 
-    def export_excel(self, query: typing.Union[str], fname: typing.Union[str]):
-        """Export result to excel"""
-        df = self.fetch_df(query)
-        return df.to_excel(fname, encoding='utf-8', index=False)
+        Rows are streamed from a server-side cursor and written batch by
+        batch, the result is never loaded as a whole.
 
-    def fetch_many(self, query, size: int = None):
+        :param query:
+        :param fname:
+        :param sep:
+        :param compression: 'gzip', 'zstd', None, or 'infer' from the suffix
+        :param batch_size: rows fetched and written at a time
+        :param params: parameters bound to the query
+        :return: ExportResult(fname, rows, bytes)
+        """
+        with self._server_cursor(query, params) as cursor:
+            result = write_csv(fetch_batches(cursor, batch_size),
+                               description_columns(cursor.description), fname,
+                               sep, compression)
+        logger.info(f"Exported {result.rows} records ({result.bytes} bytes) "
+                    f"to {fname} ✨🍰✨")
+        return result
+
+    def export_excel(self,
+                     query: typing.Union[str],
+                     fname: typing.Union[str],
+                     batch_size: int = 10000,
+                     params=None,
+                     **options):
+        """Export result to excel, streamed from a server-side cursor"""
+        writer = get_writer(fname, "xlsx", **options)
+        return writer.write_batches(
+            self.fetch_arrow_batches(query, batch_size, params))
+
+    def fetch_many(self,
+                   query,
+                   size: int = None,
+                   params=None,
+                   prepare: bool = False):
         """Fetch several rows"""
         assert self._connection is not None, "Connection is not acquired"
         cursor = self._connection.cursor()
@@ -121,16 +326,44 @@ class MySQLConnection(ConnectionBackend):
         if not size and limit_match:
             size = int(limit_match.group(1))
         try:
-            cursor.execute(query)
+            cursor.execute(query, params)
             result = cursor.fetchmany(size)
             return result
         finally:
             cursor.close()
 
-    def execute(self, query):
+    @contextlib.contextmanager
+    def _server_cursor(self, query, params=None):
+        """Execute query on an unbuffered cursor, rows stay on the server
+        until they are fetched
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        cursor = self._connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(query, params)
+            yield cursor
+        finally:
+            # reads and drops whatever rows were left unfetched
+            cursor.close()
+
+    def iterate(self, query, batch_size: int = 1000, params=None):
+        """Stream rows in batches of `batch_size`
+
+        The connection can't run other statements until the generator is
+        exhausted or closed.
+        """
+        with self._server_cursor(query, params) as cursor:
+            for rows in fetch_batches(cursor, batch_size):
+                yield from rows
+
+    def execute(self, query, params=None, prepare: bool = False):
         """Execute a query
 
                 :param str query: Query to execute.
+                :param params: sequence or dict bound to the %s / %(name)s
+                               placeholders of query
+                :param prepare: ignored, pymysql has no binary protocol to
+                                run server-side prepared statements with
 
                 :return: Number of affected rows
                 :rtype: int
@@ -138,62 +371,244 @@ class MySQLConnection(ConnectionBackend):
         assert self._connection is not None, "Connection is not acquired"
         cursor = self._connection.cursor()
         try:
-            result = cursor.execute(query)
+            result = cursor.execute(query, params)
             return result
         except Exception:
             raise Exception(f"This SQL execution failed👇\n{query}")
         finally:
             cursor.close()
 
-    def execute_many(self, query):
-        """Run several data against one query
+    def execute_many(self, query, params_seq=None):
+        """Run one statement with every parameter set of `params_seq`, or a
+        list of statements
 
-                :param query: query to execute on server
-                :return: Number of rows affected, if any.
-                :rtype: int
+        With ``Database(url, multi_statements=True)``, the statements are
+        sent together in queries as large as the server's max_allowed_packet
+        allows, and the row counts are read back result by result.
+        Otherwise they're sent one by one.
 
-                This method improves performance on multiple-row INSERT and
-                REPLACE. Otherwise it is equivalent to looping over args with
-                execute().
+                :param query: statement, or list of statements and
+                              (statement, params) pairs
+                :param params_seq: parameter sets of a single statement
+                :return: Number of rows affected by each statement
+                :rtype: list
         """
         assert self._connection is not None, "Connection is not acquired"
+        statements = iter_statements(query, params_seq)
+        counts = []
         cursor = self._connection.cursor()
         try:
-            result = cursor.execute_many(query)
-            return result
+            if not self._connection.client_flag & CLIENT.MULTI_STATEMENTS:
+                for statement, params in statements:
+                    counts.append(cursor.execute(statement, params))
+                return counts
+            max_bytes = self.max_allowed_packet() - PACKET_OVERHEAD
+            for packet in self._statement_packets(cursor, statements,
+                                                  max_bytes):
+                cursor.execute(packet)
+                counts.append(cursor.rowcount)
+                while cursor.nextset():
+                    counts.append(cursor.rowcount)
         finally:
             cursor.close()
+        return counts
 
-    def insert_many(self, table, data: typing.Union[list, tuple],
-                    cols: typing.Union[list, tuple]):
+    def _statement_packets(self, cursor, statements: typing.Iterable[tuple],
+                           max_bytes: int):
+        """Join statements, with their parameters bound, into queries of at
+        most `max_bytes` once encoded
+        """
+        encoding = self._connection.encoding
+        packet, size = [], 0
+        for statement, params in statements:
+            if params is not None:
+                statement = cursor.mogrify(statement, params)
+            statement = statement.strip().rstrip(";")
+            statement_size = len(statement.encode(encoding)) + 1
+            if packet and size + statement_size > max_bytes:
+                yield ";".join(packet)
+                packet, size = [], 0
+            packet.append(statement)
+            size += statement_size
+        if packet:
+            yield ";".join(packet)
+
+    def max_allowed_packet(self) -> int:
+        """The server's max_allowed_packet, read once per connection"""
+        assert self._connection is not None, "Connection is not acquired"
+        limits = self._database._packet_limits
+        limit = limits.get(self._connection)
+        if limit is None:
+            limit = int(self.fetch_all("SELECT @@max_allowed_packet")[0][0])
+            limits[self._connection] = limit
+        return limit
+
+    def _insert_batches(self, prefix: str, suffix: str,
+                        data: typing.Iterable[tuple], max_bytes: int):
+        """Group escaped rows into VALUES lists which, together with
+        `prefix` and `suffix`, stay within `max_bytes` once encoded
+
+        :return: iterator of (statement, rows, bytes)
+        """
+        encoding = self._connection.encoding
+        overhead = len(prefix.encode(encoding)) + len(suffix.encode(encoding))
+        values, size = [], overhead
+        for row in data:
+            value = self._connection.escape(tuple(row))
+            value_size = len(value.encode(encoding)) + 1  # the comma
+            if values and size + value_size > max_bytes:
+                yield prefix + ",".join(values) + suffix, len(values), size
+                values, size = [], overhead
+            values.append(value)
+            size += value_size
+        if values:
+            yield prefix + ",".join(values) + suffix, len(values), size
+
+    def insert_many(self,
+                    table,
+                    data: typing.Union[list, tuple],
+                    cols: typing.Union[list, tuple],
+                    max_batch_bytes: int = None):
         """Insert many records
 
+        Records are sent as multi-row INSERT statements, each as large as
+        the server's max_allowed_packet allows.
+
         :param table: table name
-        :param data: data
+        :param data: iterable of row tuples
         :param cols: columns
-        :return:
+        :param max_batch_bytes: cap the size of a statement below the packet
+                                limit
+        :return: number of affected rows
         """
         assert self._connection is not None, "Connection is not acquired"
-        cursor = self._connection.cursor()
         # 构建列名部分
         cols_str = ", ".join([f"`{col}`" for col in cols])
-        # 构建占位符部分
-        placeholders = ", ".join(["%s" for _ in cols])
         # 构建UPDATE部分
         update_stmt = ", ".join([f"`{col}` = VALUES(`{col}`)" for col in cols])
 
-        INSERT_MANY = f"""
-                INSERT INTO {table} ({cols_str}) 
-                VALUES ({placeholders})
-                ON DUPLICATE KEY UPDATE {update_stmt}
-            """
+        INSERT_PREFIX = f"INSERT INTO {table} ({cols_str}) VALUES "
+        INSERT_SUFFIX = f" ON DUPLICATE KEY UPDATE {update_stmt}"
+
+        max_bytes = self.max_allowed_packet() - PACKET_OVERHEAD
+        if max_batch_bytes:
+            max_batch_bytes = min(max_batch_bytes, max_bytes)
+        else:
+            max_batch_bytes = max_bytes
 
-        cursor.executemany(INSERT_MANY, data)
+        count, affected, started = 0, 0, time.perf_counter()
+        cursor = self._connection.cursor()
+        try:
+            for number, (statement, rows, size) in enumerate(
+                    self._insert_batches(INSERT_PREFIX, INSERT_SUFFIX, data,
+                                         max_batch_bytes)):
+                batch_started = time.perf_counter()
+                affected += cursor.execute(statement)
+                count += rows
+                logger.debug(f"{table} batch {number}: {rows} records, "
+                             f"{size} bytes in "
+                             f"{time.perf_counter() - batch_started:.3f}s")
+        finally:
+            cursor.close()
         logger.info(f"{table} inserts "
-                    f"{len(data)} records ✨🍰✨")
-        cursor.close()
+                    f"{count} records in "
+                    f"{time.perf_counter() - started:.3f}s ✨🍰✨")
+        return affected
+
+    def load_records(self,
+                     table,
+                     data: typing.Iterable[tuple],
+                     cols: typing.Union[list, tuple],
+                     duplicate: str = "update"):
+        """Bulk load records with LOAD DATA LOCAL INFILE
+
+        Rows are written to a temporary tab separated file, which the server
+        then pulls in one go. Needs ``local_infile`` enabled on the database,
+        e.g. ``Database(url, local_infile=True)``. Timezone aware datetimes
+        are written in UTC.
 
-    def insert_df(self, table, df: pd.DataFrame, dropna=False, **kwargs):
+        :param table: table name
+        :param data: iterable of row tuples
+        :param cols: columns
+        :param duplicate: 'update' upserts like `insert_many`: the file is
+                          loaded into a temporary table, then copied with
+                          INSERT ... ON DUPLICATE KEY UPDATE. 'replace' loads
+                          straight into the table with REPLACE, which deletes
+                          and reinserts duplicates, so DELETE triggers and
+                          foreign key cascades fire; 'ignore' keeps the
+                          existing rows
+        :return: number of affected rows
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        if duplicate not in ("update", "replace", "ignore"):
+            raise ValueError(f"Unsupported duplicate handling: {duplicate}")
+        cols_str = ", ".join([f"`{col}`" for col in cols])
+        staged = duplicate == "update"
+        keyword = "" if staged else duplicate.upper()
+        target = LOAD_STAGE if staged else table
+        LOAD_DATA = f"""
+                LOAD DATA LOCAL INFILE %s {keyword}
+                INTO TABLE {target}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                LINES TERMINATED BY '\\n'
+                ({cols_str})
+            """
+
+        fp = tempfile.NamedTemporaryFile("w",
+                                         encoding="utf-8",
+                                         newline="",
+                                         suffix=".tsv",
+                                         delete=False)
+        try:
+            with fp:
+                for row in data:
+                    fp.write("\t".join([load_data_field(value)
+                                        for value in row]) + "\n")
+            cursor = self._connection.cursor()
+            try:
+                if staged:
+                    result = self._load_staged(cursor, LOAD_DATA, fp.name,
+                                               table, cols)
+                else:
+                    result = cursor.execute(LOAD_DATA, (fp.name, ))
+            finally:
+                cursor.close()
+        finally:
+            os.remove(fp.name)
+        logger.info(f"{table} loads "
+                    f"{result} records ✨🍰✨")
+        return result
+
+    def _load_staged(self, cursor, load_data: str, fname: str, table,
+                     cols: typing.Union[list, tuple]) -> int:
+        """LOAD DATA into a bare temporary copy of the columns, then upsert
+        from it like `insert_many`, LOAD DATA itself only replaces or
+        ignores duplicates
+        """
+        cols_str = ", ".join([f"`{col}`" for col in cols])
+        update_stmt = ", ".join([f"`{col}` = VALUES(`{col}`)" for col in cols])
+        # no index on the stage, so a key repeated in the file is applied in
+        # order, the last row winning as with a multi-row INSERT
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {LOAD_STAGE}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {LOAD_STAGE} "
+                       f"SELECT {cols_str} FROM {table} LIMIT 0")
+        try:
+            cursor.execute(load_data, (fname, ))
+            return cursor.execute(
+                f"INSERT INTO {table} ({cols_str}) "
+                f"SELECT {cols_str} FROM {LOAD_STAGE} "
+                f"ON DUPLICATE KEY UPDATE {update_stmt}")
+        finally:
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {LOAD_STAGE}")
+
+    def insert_df(self,
+                  table,
+                  df: "pd.DataFrame",
+                  dropna=False,
+                  method: str = "insert",
+                  duplicate: str = "update",
+                  **kwargs):
         """Insert Dataframe type of data
 
         # transform dtype
@@ -202,26 +617,24 @@ class MySQLConnection(ConnectionBackend):
         :param table:
         :param df: Dataframe
         :param dropna: bool
+        :param method: 'insert' upserts with INSERT statements, 'load' bulk
+                       loads with LOAD DATA LOCAL INFILE, see `load_records`
+        :param duplicate: 'update' (upsert, like 'insert'), 'replace' or
+                          'ignore' rows with a duplicate key, only used by
+                          the 'load' method, see `load_records`
 
         :return:
         """
         if df.empty:
             logger.warning('There seems no data 😅')
         else:
-            cols = df.columns.tolist()
-
-            if dropna:
-                df.dropna(axis=kwargs.get('axis', 0),
-                          how=kwargs.get('how', 'any'),
-                          thresh=kwargs.get('thresh'),
-                          subset=kwargs.get('subset'),
-                          inplace=True)
+            if method not in ("insert", "load"):
+                raise ValueError(f"Unsupported insert method: {method}")
+            cols, data = df_to_records(df, dropna, **kwargs)
+            if method == "load":
+                self.load_records(table, data, cols, duplicate)
             else:
-                df = df.astype(object).where(pd.notnull(df), None)
-                df = df.replace(
-                    ['None', 'NULL', 'NAN', 'NA', 'nan', 'na', 'null'], None)
-            data = [tuple(row) for row in df[cols].values]
-            self.insert_many(table, data, cols)
+                self.insert_many(table, data, cols)
 
     def truncate_table(self, table):
         """Truncate table's data, but keep the table structure
@@ -266,6 +679,7 @@ class MySQLConnection(ConnectionBackend):
 
             if has_data:
                 if assure:
+                    import click
                     if not click.confirm(
                             f"Table '{table}' contains data. Confirm drop?",
                             default=False):
@@ -289,22 +703,28 @@ class MySQLConnection(ConnectionBackend):
         :param target:
         :return:
         """
-        locs = []
-        targets = []
-        for key, value in where.items():
-            locs.append(f'{key}={value}')
-        for key, value in target.items():
-            targets.append(f'{key}={value}')
-        SQL = f"""UPDATE {table} 
-        SET {' ,'.join(targets)} 
-        WHERE {' and '.join(locs)};
+        if not where:
+            raise ValueError("update needs a where condition")
+        targets = [f"`{key.strip('`')}` = %s" for key in target]
+        locs = [
+            f"`{key.strip('`')}` IS NULL"
+            if value is None else f"`{key.strip('`')}` = %s"
+            for key, value in where.items()
+        ]
+        params = list(target.values()) + [
+            value for value in where.values() if value is not None
+        ]
+        SQL = f"""UPDATE {table}
+        SET {', '.join(targets)}
+        WHERE {' AND '.join(locs)}
             """
-        self.execute(SQL)
+        count = self.execute(SQL, params)
         logger.info(f"Update data succsess ✨🍰✨")
+        return count
 
     def create_table(self,
                      table: str,
-                     df: pd.DataFrame = None,
+                     df: "pd.DataFrame" = None,
                      comments: dict = None,
                      primary_key: typing.Union[str, list, tuple] = 'id',
                      dtypes: dict = None):
@@ -1,22 +1,83 @@
 # *_*coding:utf-8 *_*
+import contextlib
+import functools
 import getpass
+import itertools
+import os
 import re
 import sys
 import typing
-import click
-import pandas as pd
-from sqlstar import logger
+import uuid
+from sqlstar.log import logger
 import warnings
 import psycopg
+from psycopg import sql
 # https://www.psycopg.org/psycopg3
 
+from sqlstar.arrow import decimal_type, record_batches
 from sqlstar.core import DatabaseURL
+from sqlstar.exporters import (ExportResult, get_writer, open_output,
+                               removed_on_error, write_csv)
 from sqlstar.interfaces import ConnectionBackend, DatabaseBackend
-from sqlstar.utils import check_dtype_postgre
+from sqlstar.pool import ConnectionPool, get_pool_kwargs
+from sqlstar.utils import (check_dtype_postgre, description_columns,
+                           description_dtypes, df_to_records, fetch_batches,
+                           iter_frames, iter_statements)
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
 
 warnings.filterwarnings('ignore')
 warnings.simplefilter('ignore')
 
+# insert_df switches from INSERT statements to COPY from this many rows
+COPY_THRESHOLD = 10000
+
+# plain SELECTs are safe to run again under EXPLAIN ANALYZE
+SELECT_STATEMENT = re.compile(r"\s*\(*\s*SELECT\b", re.IGNORECASE)
+
+# statements execute_many sends in pipeline mode before reading the results
+PIPELINE_BATCH_SIZE = 1000
+
+# Arrow types keyed by type oid, numeric from its declared precision and
+# scale, other types and plain numeric are inferred
+OID_ARROW = {
+    16: lambda pa, _: pa.bool_(),  # bool
+    20: lambda pa, _: pa.int64(),  # int8
+    21: lambda pa, _: pa.int16(),  # int2
+    23: lambda pa, _: pa.int32(),  # int4
+    26: lambda pa, _: pa.int64(),  # oid
+    700: lambda pa, _: pa.float32(),  # float4
+    701: lambda pa, _: pa.float64(),  # float8
+    17: lambda pa, _: pa.binary(),  # bytea
+    25: lambda pa, _: pa.string(),  # text
+    1042: lambda pa, _: pa.string(),  # bpchar
+    1043: lambda pa, _: pa.string(),  # varchar
+    1082: lambda pa, _: pa.date32(),  # date
+    1083: lambda pa, _: pa.time64("us"),  # time
+    1114: lambda pa, _: pa.timestamp("us"),  # timestamp
+    1184: lambda pa, _: pa.timestamp("us", tz="UTC"),  # timestamptz
+    1186: lambda pa, _: pa.duration("us"),  # interval
+    1700: decimal_type,  # numeric
+}
+
+# pandas dtypes keyed by type oid which hold every value of a column, NULLs
+# included, other types (text, numeric, date, ...) stay as python objects
+OID_DTYPES = {
+    16: "boolean",  # bool
+    20: "Int64",  # int8
+    21: "Int64",  # int2
+    23: "Int64",  # int4
+    26: "Int64",  # oid
+    700: "float64",  # float4
+    701: "float64",  # float8
+    1114: "datetime64[ns]",  # timestamp
+    1184: "datetime64[ns, UTC]",  # timestamptz
+    25: "object",  # text
+    1042: "object",  # bpchar
+    1043: "object",  # varchar
+}
+
 
 class PostgreBackend(DatabaseBackend):
 
@@ -30,7 +91,7 @@ class PostgreBackend(DatabaseBackend):
         self._db = self._database_url.database
         self._autocommit = True
         self._options = options
-        self._connection = None
+        self._pool = None  # type: typing.Optional[ConnectionPool]
 
     def _get_connection_kwargs(self) -> dict:
         url_options = self._database_url.options
@@ -44,48 +105,112 @@ class PostgreBackend(DatabaseBackend):
         return kwargs
 
     def connect(self) -> None:
-        assert self._connection is None, "DatabaseBackend is already running"
+        assert self._pool is None, "DatabaseBackend is already running"
         kwargs = self._get_connection_kwargs()
-        self._connection = psycopg.connect(dbname=self._db,
-                                           user=self._user,
-                                           password=self._password,
-                                           host=self._host,
-                                           port=self._port,
-                                           autocommit=self._autocommit,
-                                           **kwargs)
+        connect = functools.partial(psycopg.connect,
+                                    dbname=self._db,
+                                    user=self._user,
+                                    password=self._password,
+                                    host=self._host,
+                                    port=self._port,
+                                    autocommit=self._autocommit,
+                                    **kwargs)
+        self._pool = ConnectionPool(
+            connect,
+            check=lambda conn: conn.execute("SELECT 1"),
+            close=lambda conn: conn.close(),
+            **get_pool_kwargs(self._database_url.options, self._options),
+        )
+        self._pool.open()
 
     def disconnect(self) -> None:
-        assert self._connection is not None, "DatabaseBackend is not running"
-        self._connection.cursor().close()
-        self._connection = None
+        assert self._pool is not None, "DatabaseBackend is not running"
+        self._pool.close()
+        self._pool = None
 
     def connection(self) -> "PostgreConnection":
-        assert self._connection is not None, "Connection is not acquired"
-        return PostgreConnection(self, self._connection)
+        return PostgreConnection(self)
+
+    def pool_stats(self) -> dict:
+        assert self._pool is not None, "DatabaseBackend is not running"
+        return self._pool.get_stats()
 
 
 class PostgreConnection(ConnectionBackend):
 
-    def __init__(self, database: PostgreBackend, connection: psycopg.connect):
+    def __init__(self, database: PostgreBackend):
         self._database = database
-        self._connection = connection
+        self._connection = None  # type: typing.Optional[psycopg.Connection]
+
+    def acquire(self) -> None:
+        """Check a connection out of the backend's pool"""
+        assert self._connection is None, "Connection is already acquired"
+        pool = self._database._pool
+        assert pool is not None, "DatabaseBackend is not running"
+        self._connection = pool.acquire()
+
+    def release(self) -> None:
+        """Give the connection back, connections which are closed or left
+        inside a transaction are dropped from the pool
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        connection, self._connection = self._connection, None
+        idle = (connection.info.transaction_status ==
+                psycopg.pq.TransactionStatus.IDLE)
+        self._database._pool.release(connection,
+                                     discard=connection.closed or not idle)
+
+    def begin(self) -> None:
+        """Start a transaction on the autocommit connection"""
+        assert self._connection is not None, "Connection is not acquired"
+        self._connection.execute("BEGIN")
+
+    def commit(self) -> None:
+        assert self._connection is not None, "Connection is not acquired"
+        self._connection.execute("COMMIT")
+
+    def rollback(self) -> None:
+        assert self._connection is not None, "Connection is not acquired"
+        self._connection.execute("ROLLBACK")
 
     @property
     def connection(self) -> psycopg.connect:
         assert self._connection is not None, "Connection is not acquired"
         return self._connection
 
-    def fetch_all(self, query):
-        """Fetch all the rows"""
+    def fetch_all(self, query, params=None, prepare: bool = False):
+        """Fetch all the rows
+
+        :param params: sequence or dict bound to the %s / %(name)s
+                       placeholders of query
+        :param prepare: prepare the statement on the server right away,
+                        psycopg otherwise prepares queries run 5 times
+        """
         assert self._connection is not None, "Connection is not acquired"
         cursor = self._connection.cursor()
         try:
-            cursor.execute(query)
+            cursor.execute(query, params, prepare=prepare or None)
             result = cursor.fetchall()
             return result
         finally:
             cursor.close()
 
+    def explain(self, query, params=None) -> str:
+        """Plan of a statement, SELECTs run with EXPLAIN (ANALYZE, BUFFERS)
+
+        The statement runs in a transaction which is rolled back.
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        explain = ("EXPLAIN (ANALYZE, BUFFERS)"
+                   if SELECT_STATEMENT.match(query) else "EXPLAIN")
+        with self._connection.transaction(force_rollback=True):
+            cursor = self._connection.cursor()
+            try:
+                cursor.execute(f"{explain} {query}", params)
+                return "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.close()
+
     def fetch_df(self, query: typing.Union[str], *args: typing.Any,
                  **kwargs: typing.Any):
         """Fetch data, and format result into Dataframe
@@ -94,23 +219,129 @@ class PostgreConnection(ConnectionBackend):
         :return: Dataframe
         """
         assert self._connection is not None, "Connection is not acquired"
+        import pandas as pd
 
         return pd.read_sql(query, self._connection, *args, **kwargs)
 
+    def fetch_df_iter(self,
+                      query: typing.Union[str],
+                      chunksize: int = 10000,
+                      dtype: dict = None,
+                      params=None):
+        """Stream the result as Dataframes of `chunksize` rows
+
+        :param query:
+        :param chunksize: rows per Dataframe
+        :param dtype: column -> dtype overriding the types derived from the
+                      cursor description
+        :param params: parameters bound to the query
+        :return: iterator of Dataframes sharing the same dtypes
+        """
+        with self._server_cursor(query, chunksize, params) as cursor:
+            columns = description_columns(cursor.description)
+            dtypes = description_dtypes(cursor.description, OID_DTYPES)
+            dtypes.update(dtype or {})
+            yield from iter_frames(cursor, columns, dtypes, chunksize)
+
+    def fetch_arrow_batches(self,
+                            query: typing.Union[str],
+                            batch_size: int = 10000,
+                            params=None):
+        """Stream the result as pyarrow.RecordBatch objects
+
+        :param query:
+        :param batch_size: rows per record batch
+        :param params: parameters bound to the query
+        :return: iterator of record batches sharing one schema
+        """
+        with self._server_cursor(query, batch_size, params) as cursor:
+            yield from record_batches(cursor, batch_size, OID_ARROW)
+
     def export_csv(self,
                    query: typing.Union[str],
                    fname: typing.Union[str],
-                   sep: typing.Any = ','):
-        """Export result to csv"""
-        df = self.fetch_df(query)
-        return df.to_csv(fname, sep=sep, encoding='utf-8', index=False)
+                   sep: typing.Any = ',',
+                   compression: typing.Optional[str] = "infer",
+                   batch_size: int = 10000,
+                   params=None):
+        """Export result to csv
 
-    def export_excel(self, query: typing.Union[str], fname: typing.Union[str]):
-        """Export result to excel"""
-        df = self.fetch_df(query)
-        return df.to_excel(fname, encoding='utf-8', index=False)
+        Single SELECT queries are formatted by the server with
+        ``COPY (query) TO STDOUT`` and the bytes go straight to the file,
+        other queries are streamed from a server-side cursor.
 
-    def fetch_many(self, query, size: int = None):
+        :param query:
+        :param fname:
+        :param sep:
+        :param compression: 'gzip', 'zstd', None, or 'infer' from the suffix
+        :param batch_size: rows fetched and written at a time
+        :param params: parameters bound to the query
+        :return: ExportResult(fname, rows, bytes)
+        """
+        copy_query = self._copyable_query(query)
+        if copy_query is not None and isinstance(sep, str) and len(sep) == 1:
+            result = self._copy_csv(copy_query, fname, sep, compression,
+                                    params)
+        else:
+            with self._server_cursor(query, batch_size, params) as cursor:
+                result = write_csv(fetch_batches(cursor, batch_size),
+                                   description_columns(cursor.description),
+                                   fname, sep, compression)
+        logger.info(f"Exported {result.rows} records ({result.bytes} bytes) "
+                    f"to {fname} ✨🍰✨")
+        return result
+
+    @staticmethod
+    def _copyable_query(query: str) -> typing.Optional[str]:
+        """The query without its trailing semicolon, if COPY can wrap it"""
+        query = query.strip().rstrip(";").strip()
+        if ";" in query:
+            # possibly several statements, let the cursor path complain
+            return None
+        if not re.match(r"(SELECT|WITH|VALUES|TABLE)\b", query, re.IGNORECASE):
+            return None
+        return query
+
+    def _copy_csv(self,
+                  query: str,
+                  fname: str,
+                  sep: str,
+                  compression: typing.Optional[str],
+                  params=None) -> ExportResult:
+        """COPY the result to `fname` as CSV with a header, `params` are
+        bound client-side as COPY takes no server-side parameters
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        COPY_TO = sql.SQL(
+            "COPY ({}) TO STDOUT WITH (FORMAT CSV, HEADER, DELIMITER {})"
+        ).format(sql.SQL(query), sql.Literal(sep))
+        with self._connection.cursor() as cursor, \
+                removed_on_error(fname) as output:
+            # the query runs as COPY starts, a failing one leaves fname be
+            with cursor.copy(COPY_TO, params) as copy:
+                with open_output(fname, compression) as fp:
+                    output.opened = True
+                    for data in copy:
+                        fp.write(data)
+            rows = cursor.rowcount
+        return ExportResult(fname, rows, os.path.getsize(fname))
+
+    def export_excel(self,
+                     query: typing.Union[str],
+                     fname: typing.Union[str],
+                     batch_size: int = 10000,
+                     params=None,
+                     **options):
+        """Export result to excel, streamed from a server-side cursor"""
+        writer = get_writer(fname, "xlsx", **options)
+        return writer.write_batches(
+            self.fetch_arrow_batches(query, batch_size, params))
+
+    def fetch_many(self,
+                   query,
+                   size: int = None,
+                   params=None,
+                   prepare: bool = False):
         """Fetch several rows"""
         assert self._connection is not None, "Connection is not acquired"
         cursor = self._connection.cursor()
@@ -118,16 +349,41 @@ class PostgreConnection(ConnectionBackend):
         if not size and limit_match:
             size = int(limit_match.group(1))
         try:
-            cursor.execute(query)
+            cursor.execute(query, params, prepare=prepare or None)
             result = cursor.fetchmany(size)
             return result
         finally:
             cursor.close()
 
-    def execute(self, query):
+    @contextlib.contextmanager
+    def _server_cursor(self, query, batch_size: int = 1000, params=None):
+        """Execute query on a named (server-side) cursor
+
+        The cursor lives inside a transaction, which also works when the
+        connection is in autocommit mode.
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        name = f"sqlstar_{uuid.uuid4().hex}"
+        with self._connection.transaction():
+            with self._connection.cursor(name=name) as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+                yield cursor
+
+    def iterate(self, query, batch_size: int = 1000, params=None):
+        """Stream rows in batches of `batch_size`"""
+        with self._server_cursor(query, batch_size, params) as cursor:
+            for rows in fetch_batches(cursor, batch_size):
+                yield from rows
+
+    def execute(self, query, params=None, prepare: bool = False):
         """Execute a query
 
                 :param str query: Query to execute.
+                :param params: sequence or dict bound to the %s / %(name)s
+                               placeholders of query
+                :param prepare: prepare the statement on the server right
+                                away
 
                 :return: Number of affected rows
                 :rtype: int
@@ -135,38 +391,62 @@ class PostgreConnection(ConnectionBackend):
         assert self._connection is not None, "Connection is not acquired"
         cursor = self._connection.cursor()
         try:
-            result = cursor.execute(query)
-            return result
+            cursor.execute(query, params, prepare=prepare or None)
+            return cursor.rowcount
         finally:
             cursor.close()
 
-    def execute_many(self, query):
-        """Run several data against one query
-
-                :param query: query to execute on server
-                :return: Number of rows affected, if any.
-                :rtype: int
-
-                This method improves performance on multiple-row INSERT and
-                REPLACE. Otherwise it is equivalent to looping over args with
-                execute().
+    def execute_many(self,
+                     query,
+                     params_seq=None,
+                     batch_size: int = PIPELINE_BATCH_SIZE):
+        """Run one statement with every parameter set of `params_seq`, or a
+        list of statements
+
+        Statements are sent in pipeline mode, each on its own cursor, and
+        the results are synced every `batch_size` statements, so a batch
+        costs one network round trip instead of one per statement. A
+        failing statement aborts the statements of its batch.
+
+                :param query: statement, or list of statements and
+                              (statement, params) pairs
+                :param params_seq: parameter sets of a single statement
+                :return: Number of rows affected by each statement
+                :rtype: list
         """
         assert self._connection is not None, "Connection is not acquired"
-        cursor = self._connection.cursor()
-        try:
-            result = cursor.execute_many(query)
-            return result
-        finally:
-            cursor.close()
+        statements = iter_statements(query, params_seq)
+        counts = []
+        if not psycopg.Pipeline.is_supported():
+            with self._connection.cursor() as cursor:
+                for statement, params in statements:
+                    cursor.execute(statement, params)
+                    counts.append(cursor.rowcount)
+            return counts
+        with self._connection.pipeline() as pipeline:
+            while True:
+                cursors = []
+                for statement, params in itertools.islice(
+                        statements, batch_size):
+                    cursor = self._connection.cursor()
+                    cursor.execute(statement, params)
+                    cursors.append(cursor)
+                if not cursors:
+                    break
+                pipeline.sync()
+                for cursor in cursors:
+                    counts.append(cursor.rowcount)
+                    cursor.close()
+        return counts
 
     def insert_many(self, table, data: typing.Union[list, tuple],
                     cols: typing.Union[list, tuple]):
         """Insert many records
 
         :param table: table name
-        :param data: data
+        :param data: iterable of row tuples
         :param cols: columns
-        :return:
+        :return: number of inserted rows
         """
         assert self._connection is not None, "Connection is not acquired"
         cursor = self._connection.cursor()
@@ -175,12 +455,61 @@ class PostgreConnection(ConnectionBackend):
             cols=", ".join(cols),
             values=", ".join(["%s" for col in cols]))
 
-        cursor.executemany(INSERT_MANY, data)
+        try:
+            cursor.executemany(INSERT_MANY, data)
+            count = cursor.rowcount
+        finally:
+            cursor.close()
         logger.info(f"{table} inserts "
-                    f"{len(data)} records ✨🍰✨")
-        cursor.close()
+                    f"{count} records ✨🍰✨")
+        return count
 
-    def insert_df(self, table, df: pd.DataFrame, dropna=True, **kwargs):
+    def copy_records(self,
+                     table,
+                     data: typing.Iterable[tuple],
+                     cols: typing.Union[list, tuple],
+                     copy_format: str = "text"):
+        """Bulk load records with COPY ... FROM STDIN
+
+        Rows are streamed to the server as they're produced by `data`.
+
+        :param table: table name
+        :param data: iterable of row tuples
+        :param cols: columns
+        :param copy_format: 'text', or 'binary' which skips parsing values
+                            on the server but needs the exact column types
+        :return: number of records copied
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        if copy_format not in ("text", "binary"):
+            raise ValueError(f"Unsupported COPY format: {copy_format}")
+        cols_str = ", ".join(cols)
+        COPY_FROM = f"COPY {table} ({cols_str}) FROM STDIN"
+
+        count = 0
+        with self._connection.cursor() as cursor:
+            if copy_format == "binary":
+                # binary COPY needs the column types up front
+                cursor.execute(f"SELECT {cols_str} FROM {table} LIMIT 0")
+                types = [column.type_code for column in cursor.description]
+                COPY_FROM += " (FORMAT BINARY)"
+            with cursor.copy(COPY_FROM) as copy:
+                if copy_format == "binary":
+                    copy.set_types(types)
+                for row in data:
+                    copy.write_row(row)
+                    count += 1
+        logger.info(f"{table} copies "
+                    f"{count} records ✨🍰✨")
+        return count
+
+    def insert_df(self,
+                  table,
+                  df: "pd.DataFrame",
+                  dropna=True,
+                  method: str = None,
+                  copy_format: str = "text",
+                  **kwargs):
         """Insert Dataframe type of data
 
         # transform dtype
@@ -189,25 +518,25 @@ class PostgreConnection(ConnectionBackend):
         :param table:
         :param df: Dataframe
         :param dropna: bool
+        :param method: 'copy' streams rows with COPY FROM STDIN, 'insert'
+                       uses INSERT statements, by default frames of at least
+                       `COPY_THRESHOLD` rows are copied
+        :param copy_format: 'text' or 'binary', see `copy_records`
 
         :return:
         """
         if df.empty:
             logger.warning('There seems no data 😅')
         else:
-            cols = df.columns.tolist()
-            if dropna:
-                df.dropna(axis=kwargs.get('axis', 0),
-                          how=kwargs.get('how', 'any'),
-                          thresh=kwargs.get('thresh'),
-                          subset=kwargs.get('subset'),
-                          inplace=True)
+            if method is None:
+                method = "copy" if len(df) >= COPY_THRESHOLD else "insert"
+            if method not in ("insert", "copy"):
+                raise ValueError(f"Unsupported insert method: {method}")
+            cols, data = df_to_records(df, dropna, **kwargs)
+            if method == "copy":
+                self.copy_records(table, data, cols, copy_format)
             else:
-                df = df.astype(object).where(pd.notnull(df), None)
-                df = df.replace(
-                    ['None', 'NULL', 'NAN', 'NA', 'nan', 'na', 'null'], None)
-            data = [tuple(row) for row in df[cols].values]
-            self.insert_many(table, data, cols)
+                self.insert_many(table, data, cols)
 
     def truncate_table(self, table):
         """Truncate table's data, but keep the table structure
@@ -232,6 +561,30 @@ class PostgreConnection(ConnectionBackend):
         self.execute(DROP_COLUMN)
         logger.info("Column was dropped ✨🍰✨")
 
+    def update(self, table, where: dict, target: dict):
+        """Update table's data, values are bound parameters
+
+        :param table:
+        :param where: column -> value, None matches NULL
+        :param target: column -> new value
+        :return: number of updated rows
+        """
+        if not where:
+            raise ValueError("update needs a where condition")
+        targets = sql.SQL(", ").join(
+            sql.SQL("{} = %s").format(sql.Identifier(key)) for key in target)
+        locs = sql.SQL(" AND ").join(
+            sql.SQL("{} IS NULL" if value is None else "{} = %s").format(
+                sql.Identifier(key)) for key, value in where.items())
+        params = list(target.values()) + [
+            value for value in where.values() if value is not None
+        ]
+        UPDATE = sql.SQL("UPDATE {} SET {} WHERE {}").format(
+            sql.SQL(table), targets, locs)
+        count = self.execute(UPDATE, params)
+        logger.info(f"Update data succsess ✨🍰✨")
+        return count
+
     def drop_table(self, table):
         """Drop table"""
         DROP_TABLE = f"""DROP TABLE IF EXISTS {table};"""
@@ -239,6 +592,7 @@ class PostgreConnection(ConnectionBackend):
 
         # if the table is not empty, warning user
         if data:
+            import click
             confirm = click.confirm(f"Are you sure to drop table {table} ?",
                                     default=False)
             if confirm:
@@ -249,7 +603,7 @@ class PostgreConnection(ConnectionBackend):
 
     def create_table(self,
                      table,
-                     df: pd.DataFrame = None,
+                     df: "pd.DataFrame" = None,
                      comments: dict = None,
                      primary_key: typing.Union[str, list, tuple] = None,
                      dtypes: dict = None):
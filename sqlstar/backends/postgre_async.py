@@ -0,0 +1,187 @@
+# *_*coding:utf-8 *_*
+import getpass
+import re
+import typing
+
+import psycopg
+from sqlstar.log import logger
+
+from sqlstar.core import DatabaseURL
+from sqlstar.interfaces import AsyncConnectionBackend, AsyncDatabaseBackend
+from sqlstar.pool import AsyncConnectionPool, get_pool_kwargs
+from sqlstar.utils import (description_columns, encode_records,
+                           rows_to_df, run_in_executor)
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+
+class AsyncPostgreBackend(AsyncDatabaseBackend):
+
+    def __init__(self, database_url: typing.Union[DatabaseURL, str],
+                 **options: typing.Any) -> None:
+        self._database_url = DatabaseURL(database_url)
+        self._host = self._database_url.hostname
+        self._port = self._database_url.port or 5432
+        self._user = self._database_url.username or getpass.getuser()
+        self._password = self._database_url.password
+        self._db = self._database_url.database
+        self._autocommit = True
+        self._options = options
+        self._pool = None  # type: typing.Optional[AsyncConnectionPool]
+
+    def _get_connection_kwargs(self) -> dict:
+        url_options = self._database_url.options
+
+        kwargs = {}
+        ssl = url_options.get("ssl")
+
+        if ssl is not None:
+            kwargs["ssl"] = {"true": True, "false": False}[ssl.lower()]
+
+        return kwargs
+
+    async def _connect(self) -> psycopg.AsyncConnection:
+        return await psycopg.AsyncConnection.connect(
+            dbname=self._db,
+            user=self._user,
+            password=self._password,
+            host=self._host,
+            port=self._port,
+            autocommit=self._autocommit,
+            **self._get_connection_kwargs())
+
+    async def connect(self) -> None:
+        assert self._pool is None, "DatabaseBackend is already running"
+
+        async def check(conn: psycopg.AsyncConnection):
+            await conn.execute("SELECT 1")
+
+        async def close(conn: psycopg.AsyncConnection):
+            await conn.close()
+
+        self._pool = AsyncConnectionPool(
+            self._connect,
+            check=check,
+            close=close,
+            **get_pool_kwargs(self._database_url.options, self._options),
+        )
+        await self._pool.open()
+
+    async def disconnect(self) -> None:
+        assert self._pool is not None, "DatabaseBackend is not running"
+        await self._pool.close()
+        self._pool = None
+
+    def connection(self) -> "AsyncPostgreConnection":
+        return AsyncPostgreConnection(self)
+
+    def pool_stats(self) -> dict:
+        assert self._pool is not None, "DatabaseBackend is not running"
+        return self._pool.get_stats()
+
+
+class AsyncPostgreConnection(AsyncConnectionBackend):
+
+    def __init__(self, database: AsyncPostgreBackend):
+        self._database = database
+        self._connection = None  # type: typing.Optional[psycopg.AsyncConnection]
+
+    async def acquire(self) -> None:
+        """Check a connection out of the backend's pool"""
+        assert self._connection is None, "Connection is already acquired"
+        pool = self._database._pool
+        assert pool is not None, "DatabaseBackend is not running"
+        self._connection = await pool.acquire()
+
+    async def release(self) -> None:
+        """Give the connection back, connections which are closed or left
+        inside a transaction are dropped from the pool
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        connection, self._connection = self._connection, None
+        idle = (connection.info.transaction_status ==
+                psycopg.pq.TransactionStatus.IDLE)
+        await self._database._pool.release(connection,
+                                           discard=connection.closed
+                                           or not idle)
+
+    async def fetch_all(self, query, params=None):
+        """Fetch all the rows"""
+        assert self._connection is not None, "Connection is not acquired"
+        async with self._connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+
+    async def fetch_many(self, query, size: int = None, params=None):
+        """Fetch several rows"""
+        assert self._connection is not None, "Connection is not acquired"
+        limit_match = re.search(r'\bLIMIT\s+(\d+)', query, re.IGNORECASE)
+        if not size and limit_match:
+            size = int(limit_match.group(1))
+        async with self._connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchmany(size or cursor.arraysize)
+
+    async def execute(self, query, params=None):
+        """Execute a query
+
+                :param str query: Query to execute.
+
+                :return: Number of affected rows
+                :rtype: int
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        async with self._connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            return cursor.rowcount
+
+    async def fetch_df(self, query: typing.Union[str], params=None):
+        """Fetch data, and format result into Dataframe
+
+        :param query:
+        :return: Dataframe
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        async with self._connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+            columns = description_columns(cursor.description)
+        return await run_in_executor(rows_to_df, rows, columns)
+
+    async def insert_many(self, table, data: typing.Union[list, tuple],
+                          cols: typing.Union[list, tuple]):
+        """Insert many records
+
+        :param table: table name
+        :param data: data
+        :param cols: columns
+        :return:
+        """
+        assert self._connection is not None, "Connection is not acquired"
+        INSERT_MANY = "INSERT INTO {table} ({cols}) VALUES ({values})".format(
+            table=table,
+            cols=", ".join(cols),
+            values=", ".join(["%s" for col in cols]))
+
+        async with self._connection.cursor() as cursor:
+            await cursor.executemany(INSERT_MANY, data)
+        logger.info(f"{table} inserts "
+                    f"{len(data)} records ✨🍰✨")
+
+    async def insert_df(self, table, df: "pd.DataFrame", dropna=True,
+                        **kwargs):
+        """Insert Dataframe type of data
+
+        :param table:
+        :param df: Dataframe
+        :param dropna: bool
+
+        :return:
+        """
+        if df.empty:
+            logger.warning('There seems no data 😅')
+        else:
+            cols, data = await run_in_executor(encode_records, df, dropna,
+                                               **kwargs)
+            await self.insert_many(table, data, cols)
@@ -0,0 +1,489 @@
+# *_*coding:utf-8 *_*
+import collections
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import typing
+import uuid
+
+logger = logging.getLogger("sqlstar.cache")
+
+_IDENTIFIER = r'[`"\[]?[\w$]+[`"\]]?(?:\.[`"\[]?[\w$]+[`"\]]?)?'
+_LITERAL_OR_SPACE = re.compile(r"('(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\")"
+                               r"|\s+")
+_READ_TABLES = re.compile(
+    rf"\b(?:FROM|JOIN)\s+({_IDENTIFIER}(?:\s+(?:AS\s+)?\w+)?"
+    rf"(?:\s*,\s*{_IDENTIFIER}(?:\s+(?:AS\s+)?\w+)?)*)", re.IGNORECASE)
+_WRITTEN_TABLES = re.compile(
+    r"\b(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM"
+    r"|TRUNCATE(?:\s+TABLE)?|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?"
+    r"|CREATE\s+TABLE(?:\s+IF\s+NOT\s+EXISTS)?|RENAME\s+TABLE|INTO\s+TABLE"
+    rf"|COPY)\s+({_IDENTIFIER})", re.IGNORECASE)
+# statements which don't change data, anything else unknown clears the cache
+_READ_ONLY = re.compile(
+    r"\s*\(?\s*(?:SELECT|WITH|SHOW|EXPLAIN|DESCRIBE|DESC|SET|BEGIN|START"
+    r"|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace outside of string literals and drop the trailing
+    semicolon, so that formatting doesn't split cache keys
+    """
+    query = _LITERAL_OR_SPACE.sub(lambda m: m.group(1) or " ", query)
+    return query.strip().rstrip(";").rstrip()
+
+
+def normalize_table(table: str) -> str:
+    """`db`.`Orders` -> orders"""
+    return re.sub(r'[`"\[\]]', "", table).rsplit(".", 1)[-1].lower()
+
+
+def read_tables(query: str) -> typing.Set[str]:
+    """Tables a query reads from, found by FROM and JOIN clauses"""
+    tables = set()
+    for clause in _READ_TABLES.findall(query):
+        for item in clause.split(","):
+            tables.add(normalize_table(item.split()[0]))
+    return tables
+
+
+def written_tables(query: str) -> typing.Set[str]:
+    """Tables a statement writes to"""
+    return {normalize_table(table) for table in _WRITTEN_TABLES.findall(query)}
+
+
+def estimate_size(value: typing.Any) -> int:
+    """Approximate bytes held by a result, Dataframes are measured, rows are
+    sampled
+    """
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if not value:
+        return sys.getsizeof(value)
+    sample = value[:100]
+    sampled = sum(
+        sys.getsizeof(row) + sum(
+            sys.getsizeof(v)
+            for v in (row.values() if isinstance(row, dict) else row))
+        for row in sample)
+    return sys.getsizeof(value) + sampled * len(value) // len(sample)
+
+
+class _Entry:
+    __slots__ = ("value", "tables", "size", "expires_at")
+
+    def __init__(self, value: typing.Any, tables: typing.Set[str], size: int,
+                 expires_at: typing.Optional[float]):
+        self.value = value
+        self.tables = tables
+        self.size = size
+        self.expires_at = expires_at
+
+
+class QueryCache:
+    """Thread-safe in-memory LRU cache of query results
+
+    Entries are keyed on the normalized SQL plus parameters and remember the
+    tables the query reads, so that writes to a table invalidate them.
+
+    >>> db = Database(url, cache=QueryCache(max_entries=512, ttl=60))
+    >>> db.fetch_df(QUERY)             # miss, hits the server
+    >>> db.fetch_df(QUERY)             # hit
+    >>> db.fetch_df(QUERY, ttl=5)      # per-query TTL, ttl=0 bypasses
+    >>> db.cache.invalidate('orders')
+
+    :param max_entries: entries kept before the least recently used is
+                        evicted
+    :param max_bytes: approximate bytes kept before evicting
+    :param ttl: default seconds an entry lives, None for no expiry
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 ttl: typing.Optional[float] = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict(
+        )  # type: typing.OrderedDict[tuple, _Entry]
+        self._bytes = 0
+        # bumped by every invalidation, results fetched across one are
+        # possibly stale and aren't stored
+        self._generation = 0
+        self._stats = collections.Counter()  # type: typing.Counter[str]
+
+    @staticmethod
+    def key(query: str, *parts: typing.Any) -> tuple:
+        return normalize_query(query), repr(parts)
+
+    def get(self, key: tuple) -> typing.Tuple[bool, typing.Any]:
+        """Look a key up, return (hit, value)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None \
+                    and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry.value
+
+    def set(self,
+            key: tuple,
+            value: typing.Any,
+            ttl: typing.Optional[float] = None,
+            generation: int = None) -> None:
+        """Store a result, unless it's larger than the whole cache or was
+        fetched before an invalidation (`generation`)
+        """
+        size = estimate_size(value)
+        ttl = self.ttl if ttl is None else ttl
+        entry = _Entry(value, read_tables(key[0]), size,
+                       None if ttl is None else time.monotonic() + ttl)
+        with self._lock:
+            if size > self.max_bytes or (generation is not None
+                                         and generation != self._generation):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries \
+                    or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def fetch(self,
+              key: tuple,
+              fetch: typing.Callable[[], typing.Any],
+              ttl: typing.Optional[float] = None) -> typing.Any:
+        """Return the cached result of `key`, calling `fetch` on a miss
+
+        Hits return a copy, so callers may modify the result freely.
+        """
+        hit, value = self.get(key)
+        if not hit:
+            generation = self._generation
+            value = fetch()
+            self.set(key, value, ttl, generation)
+        return value.copy() if hasattr(value, "copy") else value
+
+    def invalidate(self, *tables: str) -> int:
+        """Drop the entries reading any of `tables`, return how many"""
+        tables = {normalize_table(table) for table in tables}
+        with self._lock:
+            self._generation += 1
+            keys = [
+                key for key, entry in self._entries.items()
+                if entry.tables & tables
+            ]
+            for key in keys:
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def invalidate_query(self, query: str) -> int:
+        """Invalidate the tables written by a statement, everything if the
+        statement may write but names no table
+        """
+        tables = written_tables(query)
+        if tables:
+            return self.invalidate(*tables)
+        if _READ_ONLY.match(query):
+            return 0
+        return self.clear()
+
+    def clear(self) -> int:
+        """Drop every entry, return how many"""
+        with self._lock:
+            self._generation += 1
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self._stats["invalidations"] += count
+        return count
+
+    def _remove(self, key: tuple) -> None:
+        self._bytes -= self._entries.pop(key).size
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the current size of the cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._entries),
+                         bytes=self._bytes,
+                         max_entries=self.max_entries,
+                         max_bytes=self.max_bytes)
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["hit_ratio"] = stats.get("hits", 0) / lookups if lookups else 0.0
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """Dataframe results of `fetch_df` persisted under a directory
+
+    Every result is a file named by the hash of the database URL, the
+    normalized SQL and the call arguments, so that it's reused across
+    processes and restarts. Feather files (the default) are memory-mapped
+    on hit, Parquet ones are smaller. Writes through sqlstar touch a marker
+    file per table, entries of a table older than its marker are stale, so
+    invalidations reach every process sharing the directory; writes from
+    elsewhere are only caught by `ttl`. The least recently used files are
+    removed once the directory outgrows `max_bytes`.
+
+    >>> db = Database(url, disk_cache=DiskCache('~/.cache/sqlstar', ttl=3600))
+
+    :param directory: where results are stored, created if missing
+    :param max_bytes: size the directory is trimmed to after a write
+    :param ttl: seconds an entry lives, None for no expiry
+    :param format: 'feather' (uncompressed Arrow IPC) or 'parquet'
+    """
+
+    def __init__(self,
+                 directory: str,
+                 max_bytes: int = 10 * 1024**3,
+                 ttl: typing.Optional[float] = 86400.0,
+                 format: str = "feather"):
+        if format not in ("feather", "parquet"):
+            raise ValueError(f"Unsupported disk cache format: {format}")
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.format = format
+        os.makedirs(self.directory, exist_ok=True)
+        # a file per table, its mtime is the time of the last write
+        self._markers = os.path.join(self.directory, "invalidated")
+        os.makedirs(self._markers, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()  # type: typing.Counter[str]
+
+    @staticmethod
+    def key(url: typing.Any, query: str, *parts: typing.Any) -> str:
+        """Hex digest of url, normalized query and the other `parts`"""
+        digest = hashlib.sha256()
+        for part in (str(url), normalize_query(query), repr(parts)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{self.format}")
+
+    def _read(self, path: str):
+        from sqlstar.arrow import import_pyarrow
+        pa = import_pyarrow()
+        if self.format == "parquet":
+            import pyarrow.parquet
+            return pyarrow.parquet.read_table(path, memory_map=True)
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def get(self, key: str,
+            **to_pandas: typing.Any) -> typing.Tuple[bool, typing.Any]:
+        """Look a key up, return (hit, Dataframe)
+
+        :param to_pandas: options of pyarrow.Table.to_pandas
+        """
+        path = self._path(key)
+        try:
+            table = self._read(path)
+        except (FileNotFoundError, OSError, ValueError):
+            self._count("misses")
+            return False, None
+        metadata = table.schema.metadata or {}
+        expires_at = metadata.get(b"sqlstar.expires_at")
+        if expires_at and float(expires_at) <= time.time():
+            self._remove(path)
+            self._count("expired", "misses")
+            return False, None
+        if self._stale(metadata):
+            self._remove(path)
+            self._count("invalidations", "misses")
+            return False, None
+        try:
+            # the file's mtime is its last use, for the LRU trimming
+            os.utime(path)
+        except OSError:
+            pass
+        self._count("hits")
+        return True, table.to_pandas(**to_pandas)
+
+    def _marker(self, table: str) -> str:
+        return os.path.join(self._markers, normalize_table(table))
+
+    def _stale(self, metadata: dict) -> bool:
+        """Whether a table the entry reads was written after its fetch"""
+        fetched_at = float(metadata.get(b"sqlstar.fetched_at", 0))
+        tables = metadata.get(b"sqlstar.tables", b"").decode("utf-8")
+        for table in filter(None, tables.split(",")):
+            try:
+                if os.stat(self._marker(table)).st_mtime >= fetched_at:
+                    return True
+            except FileNotFoundError:
+                pass
+        return False
+
+    def set(self,
+            key: str,
+            df: typing.Any,
+            ttl: float = None,
+            tables: typing.Iterable[str] = (),
+            fetched_at: float = None) -> None:
+        """Write a Dataframe, skipping those Arrow can't represent
+
+        :param tables: tables the result was read from, writes to them
+                       invalidate it
+        :param fetched_at: time the fetch started, writes since then
+                           invalidate the entry right away
+        """
+        from sqlstar.arrow import import_pyarrow
+        pa = import_pyarrow()
+        ttl = self.ttl if ttl is None else ttl
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowException, TypeError, ValueError) as exc:
+            logger.debug("Result not disk cached: %s", exc)
+            return
+        metadata = {
+            **(table.schema.metadata or {}),
+            b"sqlstar.fetched_at": str(fetched_at).encode(),
+            b"sqlstar.tables": ",".join(
+                sorted(normalize_table(t) for t in tables)).encode("utf-8"),
+        }
+        if ttl is not None:
+            metadata[b"sqlstar.expires_at"] = str(time.time() + ttl).encode()
+        table = table.replace_schema_metadata(metadata)
+        path = self._path(key)
+        # written aside then renamed, readers never see a partial file
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if self.format == "parquet":
+                import pyarrow.parquet
+                pyarrow.parquet.write_table(table, tmp)
+            else:
+                with pa.OSFile(tmp, "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._count("writes")
+        self.trim()
+
+    def fetch(self,
+              key: str,
+              fetch: typing.Callable[[], typing.Any],
+              ttl: typing.Optional[float] = None,
+              tables: typing.Iterable[str] = (),
+              **to_pandas: typing.Any) -> typing.Any:
+        """Return the stored Dataframe of `key`, calling `fetch` on a miss
+
+        :param tables: tables the query reads, see `set`
+        """
+        hit, df = self.get(key, **to_pandas)
+        if not hit:
+            fetched_at = time.time()
+            df = fetch()
+            self.set(key, df, ttl, tables, fetched_at)
+        return df
+
+    def invalidate(self, *tables: str) -> None:
+        """Mark the entries reading any of `tables` as stale"""
+        now = time.time()
+        for table in tables:
+            marker = self._marker(table)
+            with open(marker, "a"):
+                pass
+            os.utime(marker, (now, now))
+
+    def invalidate_query(self, query: str) -> None:
+        """Invalidate the tables written by a statement, everything if the
+        statement may write but names no table
+        """
+        tables = written_tables(query)
+        if tables:
+            self.invalidate(*tables)
+        elif not _READ_ONLY.match(query):
+            self.clear()
+
+    def _files(self) -> typing.List[os.DirEntry]:
+        suffix = f".{self.format}"
+        return [
+            entry for entry in os.scandir(self.directory)
+            if entry.name.endswith(suffix) and entry.is_file()
+        ]
+
+    def trim(self) -> int:
+        """Remove the least recently used files until the directory holds
+        at most `max_bytes`, return how many were removed
+        """
+        with self._lock:
+            files = []
+            for entry in self._files():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                removed += 1
+            self._stats["evictions"] += removed
+        return removed
+
+    def clear(self) -> int:
+        """Remove every stored result, return how many"""
+        files = self._files()
+        for entry in files:
+            self._remove(entry.path)
+        return len(files)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _count(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._stats[name] += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the current size of the directory"""
+        files = self._files()
+        with self._lock:
+            stats = dict(self._stats)
+        size = 0
+        for entry in files:
+            try:
+                size += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        stats.update(entries=len(files), bytes=size, max_bytes=self.max_bytes)
+        return stats
@@ -0,0 +1,379 @@
+# *_*coding:utf-8 *_*
+import contextlib
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import types
+import typing
+
+from sqlstar.importer import import_from_string
+from sqlstar.utils import decoding
+
+
+class ExportResult(typing.NamedTuple):
+    fname: str
+    rows: int
+    bytes: int
+
+
+COMPRESSION_SUFFIXES = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+}
+
+
+def infer_compression(fname: str, compression: typing.Optional[str]):
+    """Resolve 'infer' from the file suffix, None means no compression"""
+    if compression == "infer":
+        return COMPRESSION_SUFFIXES.get(os.path.splitext(fname)[1].lower())
+    if compression not in (None, "gzip", "zstd"):
+        raise ValueError(f"Unsupported compression: {compression}")
+    return compression
+
+
+def open_output(fname: str,
+                compression: typing.Optional[str] = "infer") -> typing.IO:
+    """Open `fname` for binary writing, compressing on the fly
+
+    :param compression: 'gzip', 'zstd', None, or 'infer' from the suffix
+                        (.gz, .zst)
+    """
+    compression = infer_compression(fname, compression)
+    if compression == "gzip":
+        return gzip.open(fname, "wb", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression needs zstandard, "
+                              "`pip install zstandard`")
+        return zstandard.ZstdCompressor().stream_writer(open(fname, "wb"),
+                                                        closefd=True)
+    return open(fname, "wb")
+
+
+@contextlib.contextmanager
+def removed_on_error(fname: str):
+    """Delete the partial output of a failed export, once the export has
+    set ``opened``: a query failing before that leaves a file already at
+    `fname` alone
+
+    >>> with removed_on_error(fname) as output:
+    ...     fp = open_output(fname)
+    ...     output.opened = True
+    """
+    output = types.SimpleNamespace(opened=False)
+    try:
+        yield output
+    except BaseException:
+        if output.opened:
+            with contextlib.suppress(OSError):
+                os.remove(fname)
+        raise
+
+
+def write_csv(batches: typing.Iterable[typing.Sequence[tuple]],
+              columns: list,
+              fname: str,
+              sep: str = ",",
+              compression: typing.Optional[str] = "infer",
+              encoding: str = "utf-8") -> ExportResult:
+    """Write batches of rows as CSV, one batch in memory at a time
+
+    :param batches: iterable of lists of row tuples
+    :param columns: header
+    :param fname: output path
+    :param sep: field delimiter
+    :param compression: see `open_output`
+    :return: rows written and bytes on disk
+    """
+    rows = 0
+    batches = iter(batches)
+    # a lazy query runs on the first batch, before the file is touched
+    first = next(batches, [])
+    with removed_on_error(fname) as output:
+        with io.TextIOWrapper(open_output(fname, compression),
+                              encoding=encoding,
+                              newline="") as fp:
+            output.opened = True
+            writer = csv.writer(fp, delimiter=sep)
+            writer.writerow(columns)
+            for batch in itertools.chain([first], batches):
+                with decoding():
+                    writer.writerows(batch)
+                rows += len(batch)
+    return ExportResult(fname, rows, os.path.getsize(fname))
+
+
+class ExportWriter:
+    """Base of the streaming writers behind `Database.export`
+
+    A writer is fed pyarrow.RecordBatch objects one at a time, so only one
+    batch is in memory. Subclasses set up the output in `open` and write a
+    batch in `write`, and are registered in `EXPORT_FORMATS`.
+    """
+
+    def __init__(self, fname: str, **options: typing.Any):
+        self.fname = fname
+        self.options = options
+        self.schema = None
+        self.rows = 0
+
+    def open(self, schema) -> None:
+        raise NotImplementedError()
+
+    def write(self, batch) -> None:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        raise NotImplementedError()
+
+    def write_batches(self, batches: typing.Iterable) -> ExportResult:
+        """Write every batch and close the output, which is removed when
+        writing fails
+        """
+        with removed_on_error(self.fname) as output:
+            try:
+                for batch in batches:
+                    if self.schema is None:
+                        # columns which are NULL in the first batch have no
+                        # type yet, the file gets a string column for them
+                        self.schema = self._file_schema(batch.schema)
+                        self.open(self.schema)
+                        output.opened = True
+                    if batch.schema != self.schema:
+                        batch = self._conform(batch)
+                    if batch.num_rows:
+                        with decoding():
+                            self.write(batch)
+                        self.rows += batch.num_rows
+            finally:
+                if output.opened:
+                    self.close()
+        return ExportResult(self.fname, self.rows,
+                            os.path.getsize(self.fname))
+
+    @staticmethod
+    def _file_schema(schema):
+        from sqlstar.arrow import import_pyarrow
+        pa = import_pyarrow()
+        return pa.schema([
+            field.with_type(pa.string())
+            if pa.types.is_null(field.type) else field for field in schema
+        ])
+
+    def _conform(self, batch):
+        """Cast a batch to the schema of the file, which can't change once
+        written; lossy casts raise instead of truncating
+        """
+        from sqlstar.arrow import import_pyarrow
+        pa = import_pyarrow()
+        arrays = []
+        for column, field in zip(batch.columns, self.schema):
+            try:
+                arrays.append(column.cast(field.type, safe=True))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as exc:
+                raise ValueError(
+                    f"Column {field.name} changed from {field.type} to "
+                    f"{column.type} after the first batch, cast it in the "
+                    f"query to give it a fixed type: {exc}") from exc
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+class CSVWriter(ExportWriter):
+    """CSV with a header, options: `sep` (a tab for .tsv files, a comma
+    otherwise) and `compression` (gzip/zstd/infer)
+    """
+
+    def open(self, schema) -> None:
+        import pyarrow.csv
+        sep = "\t" if file_suffix(self.fname) == ".tsv" else ","
+        self._fp = open_output(self.fname,
+                               self.options.get("compression", "infer"))
+        self._writer = pyarrow.csv.CSVWriter(
+            self._fp,
+            schema,
+            write_options=pyarrow.csv.WriteOptions(
+                delimiter=self.options.get("sep", sep)))
+
+    def write(self, batch) -> None:
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+        self._fp.close()
+
+
+class JSONLinesWriter(ExportWriter):
+    """One JSON object per row, options: `compression` (gzip/zstd/infer)
+
+    Values JSON can't represent (datetimes, decimals, ...) are written as
+    strings.
+    """
+
+    def open(self, schema) -> None:
+        self._fp = io.TextIOWrapper(open_output(
+            self.fname, self.options.get("compression", "infer")),
+                                    encoding="utf-8",
+                                    newline="\n")
+
+    def write(self, batch) -> None:
+        self._fp.writelines(
+            json.dumps(row, ensure_ascii=False, default=str) + "\n"
+            for row in batch.to_pylist())
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+class ParquetWriter(ExportWriter):
+    """Parquet with a row group per batch, options: `compression` codec
+    (snappy, zstd, gzip, ... default snappy)
+    """
+
+    def open(self, schema) -> None:
+        import pyarrow.parquet
+        self._writer = pyarrow.parquet.ParquetWriter(
+            self.fname,
+            schema,
+            compression=self.options.get("compression", "snappy"))
+
+    def write(self, batch) -> None:
+        self._writer.write_batch(batch, row_group_size=batch.num_rows)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class FeatherWriter(ExportWriter):
+    """Feather v2, i.e. the Arrow IPC file format, options: `compression`
+    codec (lz4, zstd or None, default lz4)
+    """
+
+    def open(self, schema) -> None:
+        from sqlstar.arrow import import_pyarrow
+        pa = import_pyarrow()
+        self._writer = pa.ipc.new_file(
+            self.fname,
+            schema,
+            options=pa.ipc.IpcWriteOptions(
+                compression=self.options.get("compression", "lz4")))
+
+    def write(self, batch) -> None:
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+EXCEL_MAX_ROWS = 1048576
+
+
+class ExcelWriter(ExportWriter):
+    """xlsx in xlsxwriter's constant memory mode, rows are flushed as they
+    are written. A new sheet is started whenever one is full, options:
+    `sheet_name` prefix of the sheets (Sheet1, Sheet2, ...) and
+    `sheet_rows` data rows per sheet (at most 1048575, the header takes one)
+    """
+
+    def __init__(self, fname: str, **options: typing.Any):
+        super().__init__(fname, **options)
+        sheet_rows = options.get("sheet_rows", EXCEL_MAX_ROWS - 1)
+        if not 1 <= sheet_rows <= EXCEL_MAX_ROWS - 1:
+            raise ValueError(f"sheet_rows must be between 1 and "
+                             f"{EXCEL_MAX_ROWS - 1}, got {sheet_rows}")
+        self._sheet_rows = sheet_rows
+
+    def open(self, schema) -> None:
+        try:
+            import xlsxwriter
+        except ImportError:
+            raise ImportError("excel export needs xlsxwriter, "
+                              "`pip install sqlstar[excel]`")
+        self._workbook = xlsxwriter.Workbook(
+            self.fname, {
+                "constant_memory": True,
+                "remove_timezone": True,
+                "default_date_format": "yyyy-mm-dd hh:mm:ss",
+            })
+        self._sheets = 0
+        self._row = self._sheet_rows
+
+    def _add_sheet(self) -> None:
+        self._sheets += 1
+        self._sheet = self._workbook.add_worksheet(
+            f"{self.options.get('sheet_name', 'Sheet')}{self._sheets}")
+        self._sheet.write_row(0, 0, self.schema.names)
+        self._row = 0
+
+    def write(self, batch) -> None:
+        columns = [column.to_pylist() for column in batch.columns]
+        for row in zip(*columns):
+            if self._row == self._sheet_rows:
+                self._add_sheet()
+            self._row += 1
+            self._sheet.write_row(self._row, 0, row)
+
+    def close(self) -> None:
+        if not self._sheets:
+            self._add_sheet()
+        self._workbook.close()
+
+
+EXPORT_FORMATS = {
+    "csv": "sqlstar.exporters:CSVWriter",
+    "jsonl": "sqlstar.exporters:JSONLinesWriter",
+    "parquet": "sqlstar.exporters:ParquetWriter",
+    "feather": "sqlstar.exporters:FeatherWriter",
+    "xlsx": "sqlstar.exporters:ExcelWriter",
+}
+
+FORMAT_SUFFIXES = {
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+    ".xlsx": "xlsx",
+}
+
+
+def file_suffix(fname: str) -> str:
+    """Lower case suffix of `fname`, ignoring .gz/.zst"""
+    root, suffix = os.path.splitext(str(fname).lower())
+    if suffix in COMPRESSION_SUFFIXES:
+        suffix = os.path.splitext(root)[1]
+    return suffix
+
+
+def infer_format(fname: str) -> str:
+    """Export format from the file suffix, ignoring .gz/.zst"""
+    suffix = file_suffix(fname)
+    if suffix not in FORMAT_SUFFIXES:
+        raise ValueError(f"Can't infer the export format of {fname}, "
+                         f"pass one of {', '.join(EXPORT_FORMATS)}")
+    return FORMAT_SUFFIXES[suffix]
+
+
+def get_writer(fname: str,
+               format: typing.Union[str, type, None] = None,
+               **options: typing.Any) -> ExportWriter:
+    """Instantiate the writer of `format`, a key of `EXPORT_FORMATS` or an
+    `ExportWriter` subclass, inferred from `fname` by default
+    """
+    if isinstance(format, type):
+        writer_cls = format
+    else:
+        format = format or infer_format(fname)
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {format}")
+        writer_cls = import_from_string(EXPORT_FORMATS[format])
+    assert issubclass(writer_cls, ExportWriter)
+    return writer_cls(fname, **options)
@@ -1,6 +1,8 @@
 # *_*coding:utf-8 *_*
 import typing
-import pandas as pd
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
 
 
 class DatabaseBackend:
@@ -14,19 +16,44 @@ class DatabaseBackend:
     def connection(self) -> "ConnectionBackend":
         raise NotImplementedError()
 
+    def pool_stats(self) -> dict:
+        raise NotImplementedError()
+
 
 class ConnectionBackend:
 
-    def fetch_all(self, query: typing.Union[str]):
+    def acquire(self) -> None:
+        raise NotImplementedError()
+
+    def release(self) -> None:
+        raise NotImplementedError()
+
+    def fetch_all(self, query: typing.Union[str], params, prepare: bool):
+        raise NotImplementedError()
+
+    def fetch_many(self, query: typing.Union[str], size: int, params,
+                   prepare: bool):
+        raise NotImplementedError()
+
+    def iterate(self, query: typing.Union[str], batch_size: int, params):
+        raise NotImplementedError()
+
+    def begin(self) -> None:
         raise NotImplementedError()
 
-    def fetch_many(self, query: typing.Union[str], size: int):
+    def commit(self) -> None:
         raise NotImplementedError()
 
-    def execute(self, query: typing.Union[str]):
+    def rollback(self) -> None:
         raise NotImplementedError()
 
-    def execute_many(self, queries: typing.List[typing.Union[str, dict]]):
+    def execute(self, query: typing.Union[str], params, prepare: bool):
+        raise NotImplementedError()
+
+    def execute_many(self, query: typing.Union[str, list], params_seq):
+        raise NotImplementedError()
+
+    def explain(self, query: typing.Union[str], params) -> str:
         raise NotImplementedError()
 
     def truncate_table(self, table: typing.Union[str]):
@@ -39,11 +66,25 @@ class ConnectionBackend:
                  **kwargs: typing.Any):
         raise NotImplementedError()
 
+    def fetch_df_iter(self, query: typing.Union[str], chunksize: int,
+                      dtype: dict, params):
+        raise NotImplementedError()
+
+    def fetch_arrow_batches(self, query: typing.Union[str], batch_size: int,
+                            params):
+        raise NotImplementedError()
+
     def export_csv(self, query: typing.Union[str], fname: typing.Union[str],
-                   sep: typing.Any):
+                   sep: typing.Any, compression: typing.Optional[str],
+                   batch_size: int, params):
         raise NotImplementedError()
 
-    def export_excel(self, query: typing.Union[str], fname: typing.Union[str]):
+    def export_excel(self,
+                     query: typing.Union[str],
+                     fname: typing.Union[str],
+                     batch_size: int = 10000,
+                     params=None,
+                     **options):
         raise NotImplementedError()
 
     def drop_table(self, table, assure):
@@ -54,7 +95,7 @@ class ConnectionBackend:
 
     def create_table(self,
                      table,
-                     df: pd.DataFrame = None,
+                     df: "pd.DataFrame" = None,
                      comments: dict = None,
                      primary_key: typing.Union[str, list, tuple] = None,
                      dtypes: dict = None):
@@ -64,7 +105,7 @@ class ConnectionBackend:
                     cols: typing.Union[list, tuple]):
         raise NotImplementedError()
 
-    def insert_df(self, table, df: pd.DataFrame, dropna=False, **kwargs):
+    def insert_df(self, table, df: "pd.DataFrame", dropna=False, **kwargs):
         raise NotImplementedError()
 
     def rename_table(self, table: str, name: str):
@@ -99,3 +140,47 @@ class ConnectionBackend:
     def add_primary_key(self, table: str, primary_key: typing.Union[str, list,
                                                                     tuple]):
         raise NotImplementedError()
+
+
+class AsyncDatabaseBackend:
+
+    async def connect(self) -> None:
+        raise NotImplementedError()
+
+    async def disconnect(self) -> None:
+        raise NotImplementedError()
+
+    def connection(self) -> "AsyncConnectionBackend":
+        raise NotImplementedError()
+
+    def pool_stats(self) -> dict:
+        raise NotImplementedError()
+
+
+class AsyncConnectionBackend:
+
+    async def acquire(self) -> None:
+        raise NotImplementedError()
+
+    async def release(self) -> None:
+        raise NotImplementedError()
+
+    async def fetch_all(self, query: typing.Union[str], params):
+        raise NotImplementedError()
+
+    async def fetch_many(self, query: typing.Union[str], size: int, params):
+        raise NotImplementedError()
+
+    async def execute(self, query: typing.Union[str], params):
+        raise NotImplementedError()
+
+    async def fetch_df(self, query: typing.Union[str], params):
+        raise NotImplementedError()
+
+    async def insert_many(self, table, data: typing.Union[list, tuple],
+                          cols: typing.Union[list, tuple]):
+        raise NotImplementedError()
+
+    async def insert_df(self, table, df: "pd.DataFrame", dropna=False,
+                        **kwargs):
+        raise NotImplementedError()
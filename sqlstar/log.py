@@ -0,0 +1,18 @@
+# *_*coding:utf-8 *_*
+"""The loguru logger of the backends
+
+Configured on first import instead of by ``import sqlstar``, loguru alone
+costs about as much to import as the rest of the package.
+"""
+import sys
+
+from loguru import logger
+
+logger.remove()
+logger.add(
+    sys.stderr,
+    format=
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> | <cyan>{file}:{line}</cyan> - <level>{message}</level>"
+)
+
+__all__ = ["logger"]
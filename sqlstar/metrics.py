@@ -0,0 +1,450 @@
+# *_*coding:utf-8 *_*
+import bisect
+import functools
+import os
+import threading
+import time
+import typing
+import uuid
+
+from sqlstar.cache import estimate_size, read_tables, written_tables
+from sqlstar.utils import DECODE_SECONDS
+
+# upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# backend calls taking a query, labelled by the tables it reads or writes
+QUERY_OPERATIONS = {
+    "fetch_all", "fetch_many", "iterate", "execute", "execute_many",
+    "fetch_df", "fetch_df_iter", "fetch_arrow_batches", "export_csv",
+    "export_excel"
+}
+# backend calls taking a table name first
+TABLE_OPERATIONS = {
+    "insert_many", "insert_df", "create_table", "truncate_table",
+    "drop_table", "drop_column", "update", "rename_table", "rename_column",
+    "add_column", "add_table_comment", "change_column_attribute",
+    "add_primary_key"
+}
+# generators, timed while the backend produces the next item
+STREAMING_OPERATIONS = {"iterate", "fetch_df_iter", "fetch_arrow_batches"}
+# positional index of the query parameters, the others take ``params=``
+PARAMS_POSITIONS = {
+    "fetch_all": 1,
+    "execute": 1,
+    "fetch_many": 2,
+    "iterate": 2,
+    "fetch_arrow_batches": 2,
+    "fetch_df_iter": 3
+}
+
+
+class QueryEvent:
+    """One observed backend call
+
+    `seconds` is the wall time, of which `decode_seconds` went into
+    converting rows to or from Dataframes, Arrow or files, the rest,
+    `driver_seconds`, into the driver, the network and the server.
+    """
+    __slots__ = ("operation", "query", "params", "table", "seconds",
+                 "decode_seconds", "rows", "bytes", "error")
+
+    def __init__(self, operation: str, query: typing.Any, params: typing.Any,
+                 table: str):
+        self.operation = operation
+        self.query = query
+        self.params = params
+        self.table = table
+        self.seconds = 0.0
+        self.decode_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.error = None  # type: typing.Optional[BaseException]
+
+    @property
+    def driver_seconds(self) -> float:
+        return max(self.seconds - self.decode_seconds, 0.0)
+
+
+class Observer:
+    """Hooks called around every backend call of a `Connection`
+
+    >>> class Printer(Observer):
+    ...     def on_query(self, event):
+    ...         print(event.operation, event.table, event.seconds)
+    >>> db.observers.append(Printer())
+    """
+
+    def on_query(self, event: QueryEvent) -> None:
+        """A backend call finished, or failed with `event.error`"""
+
+    def on_pool_wait(self, seconds: float) -> None:
+        """A pooled connection was checked out after `seconds`"""
+
+
+@functools.lru_cache(maxsize=1024)
+def table_label(query: str) -> str:
+    """Tables a query writes, or else reads, comma separated"""
+    tables = written_tables(query) or read_tables(query)
+    return ",".join(sorted(tables))
+
+
+def measure(result: typing.Any) -> typing.Tuple[int, int]:
+    """Rows and approximate bytes of a backend call result
+
+    Counts are affected rows, exports report the rows and bytes written,
+    Dataframes are measured without inspecting python objects and row
+    tuples are sampled.
+    """
+    if result is None or isinstance(result, bool):
+        return 0, 0
+    if isinstance(result, int):
+        # drivers report -1 when the count doesn't apply
+        return max(result, 0), 0
+    if hasattr(result, "fname") and hasattr(result, "rows"):
+        # ExportResult
+        return result.rows, result.bytes
+    if hasattr(result, "num_rows"):
+        # pyarrow Table and RecordBatch
+        return result.num_rows, result.nbytes
+    if hasattr(result, "memory_usage"):
+        return len(result), int(result.memory_usage(index=False).sum())
+    if isinstance(result, (list, tuple)):
+        if result and isinstance(result[0], int):
+            # execute_many
+            return sum(count for count in result if count > 0), 0
+        return len(result), estimate_size(result)
+    return 0, 0
+
+
+class InstrumentedConnection:
+    """Proxy of a `ConnectionBackend` reporting its calls to observers
+
+    `Connection` puts it in front of the backend connection at checkout
+    while the `Database` has observers. The list is shared, so observers
+    added later apply from the next checkout of existing connections.
+    """
+
+    def __init__(self, connection: typing.Any, observers: list):
+        self._connection = connection
+        self._observers = observers
+
+    def __getattr__(self, name: str) -> typing.Any:
+        attr = getattr(self._connection, name)
+        if not self._observers:
+            return attr
+        if name == "acquire":
+            return functools.partial(self._acquire, attr)
+        if name in QUERY_OPERATIONS or name in TABLE_OPERATIONS:
+            call = (self._stream
+                    if name in STREAMING_OPERATIONS else self._call)
+            return functools.partial(call, name, attr)
+        return attr
+
+    def _acquire(self, acquire: typing.Callable) -> typing.Any:
+        start = time.perf_counter()
+        result = acquire()
+        waited = time.perf_counter() - start
+        for observer in self._observers:
+            observer.on_pool_wait(waited)
+        return result
+
+    def _event(self, operation: str, args: tuple,
+               kwargs: dict) -> QueryEvent:
+        target = args[0] if args else kwargs.get("query", kwargs.get("table"))
+        if operation in TABLE_OPERATIONS:
+            return QueryEvent(operation, None, None, str(target))
+        if isinstance(target, str):
+            table = table_label(target)
+        else:
+            # execute_many statements, strings or (statement, params) pairs
+            target = [s if isinstance(s, str) else s[0] for s in target]
+            table = ",".join(sorted({t for s in target for t in
+                                     table_label(s).split(",") if t}))
+        position = PARAMS_POSITIONS.get(operation, len(args))
+        params = (args[position]
+                  if position < len(args) else kwargs.get("params"))
+        return QueryEvent(operation, target, params, table)
+
+    def _notify(self, event: QueryEvent) -> None:
+        for observer in self._observers:
+            observer.on_query(event)
+
+    def _call(self, operation: str, method: typing.Callable, *args: typing.Any,
+              **kwargs: typing.Any) -> typing.Any:
+        event = self._event(operation, args, kwargs)
+        timer = [0.0]
+        token = DECODE_SECONDS.set(timer)
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except BaseException as exc:
+            event.seconds = time.perf_counter() - start
+            event.decode_seconds = timer[0]
+            event.error = exc
+            self._notify(event)
+            raise
+        finally:
+            DECODE_SECONDS.reset(token)
+        event.seconds = time.perf_counter() - start
+        event.decode_seconds = timer[0]
+        event.rows, event.bytes = measure(result)
+        if operation in ("insert_many", "insert_df"):
+            # rows and bytes sent rather than the affected count
+            sent = args[1] if len(args) > 1 else kwargs.get(
+                "data", kwargs.get("df"))
+            if sent is not None:
+                event.rows, event.bytes = measure(sent)
+        self._notify(event)
+        return result
+
+    def _stream(self, operation: str, method: typing.Callable,
+                *args: typing.Any, **kwargs: typing.Any) -> typing.Iterator:
+        event = self._event(operation, args, kwargs)
+        iterator = method(*args, **kwargs)
+        timer = [0.0]
+        try:
+            while True:
+                token = DECODE_SECONDS.set(timer)
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    event.seconds += time.perf_counter() - start
+                    event.decode_seconds = timer[0]
+                    DECODE_SECONDS.reset(token)
+                if operation == "iterate":
+                    event.rows += 1
+                else:
+                    rows, nbytes = measure(item)
+                    event.rows += rows
+                    event.bytes += nbytes
+                yield item
+        except BaseException as exc:
+            if not isinstance(exc, GeneratorExit):
+                event.error = exc
+            raise
+        finally:
+            iterator.close()
+            self._notify(event)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and max of observed values"""
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: typing.Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self) -> typing.List[typing.Tuple[float, int]]:
+        """(upper bound, observations at or below it) pairs"""
+        total, pairs = 0, []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile, the max for
+        values past the last bucket
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _Series:
+    __slots__ = ("latency", "errors", "rows", "bytes")
+
+    def __init__(self, buckets: typing.Sequence[float]):
+        self.latency = Histogram(buckets)
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics(Observer):
+    """Thread-safe registry of backend call latencies, rows, bytes and pool
+    wait times, labelled by operation and table
+
+    >>> db = Database(url, metrics=True)
+    >>> db.fetch_all(QUERY)
+    >>> db.metrics()['fetch_all']['orders']
+    {'count': 1, 'errors': 0, 'seconds': 0.0042, 'max': 0.0042, 'p50': 0.005, ...}
+
+    Prometheus scrapes it from a file or an endpoint:
+
+    >>> registry = Metrics()
+    >>> db = Database(url, metrics=registry)
+    >>> registry.write_prometheus('/var/lib/node_exporter/sqlstar.prom')
+    >>> registry.serve(9464)
+    """
+
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # type: typing.Dict[typing.Tuple[str, str], _Series]
+        self._pool_wait = Histogram(self.buckets)
+        self._lock = threading.Lock()
+
+    def on_query(self, event: QueryEvent) -> None:
+        key = (event.operation, event.table or "")
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.buckets)
+            series.latency.observe(event.seconds)
+            series.rows += event.rows
+            series.bytes += event.bytes
+            if event.error is not None:
+                series.errors += 1
+
+    def on_pool_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._pool_wait.observe(seconds)
+
+    @staticmethod
+    def _summary(histogram: Histogram) -> dict:
+        return {
+            "count": histogram.count,
+            "seconds": histogram.sum,
+            "max": histogram.max,
+            "p50": histogram.quantile(0.5),
+            "p95": histogram.quantile(0.95),
+            "p99": histogram.quantile(0.99),
+        }
+
+    def snapshot(self) -> dict:
+        """operation -> table -> counters, and ``pool_wait``
+
+        Percentiles are bucket upper bounds.
+        """
+        snapshot = {}  # type: typing.Dict[str, typing.Any]
+        with self._lock:
+            for (operation, table), series in sorted(self._series.items()):
+                summary = self._summary(series.latency)
+                summary.update(errors=series.errors,
+                               rows=series.rows,
+                               bytes=series.bytes)
+                snapshot.setdefault(operation, {})[table] = summary
+            snapshot["pool_wait"] = self._summary(self._pool_wait)
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._pool_wait = Histogram(self.buckets)
+
+    def _histogram_lines(self, name: str, labels: str,
+                         histogram: Histogram) -> typing.List[str]:
+        sep = "," if labels else ""
+        lines = [
+            f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}'
+            for bound, count in histogram.cumulative()
+        ]
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} '
+                     f'{histogram.count}')
+        labels = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{labels} {histogram.sum}")
+        lines.append(f"{name}_count{labels} {histogram.count}")
+        return lines
+
+    def to_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format"""
+        latency = [
+            "# HELP sqlstar_query_duration_seconds Time spent in backend calls",
+            "# TYPE sqlstar_query_duration_seconds histogram"
+        ]
+        counters = {
+            "errors": ["# HELP sqlstar_query_errors_total Failed backend calls",
+                       "# TYPE sqlstar_query_errors_total counter"],
+            "rows": ["# HELP sqlstar_query_rows_total Rows returned, "
+                     "affected or sent",
+                     "# TYPE sqlstar_query_rows_total counter"],
+            "bytes": ["# HELP sqlstar_query_bytes_total Approximate bytes "
+                      "transferred",
+                      "# TYPE sqlstar_query_bytes_total counter"],
+        }
+        with self._lock:
+            for (operation, table), series in sorted(self._series.items()):
+                labels = (f'operation="{_escape(operation)}",'
+                          f'table="{_escape(table)}"')
+                latency.extend(
+                    self._histogram_lines("sqlstar_query_duration_seconds",
+                                          labels, series.latency))
+                for name, lines in counters.items():
+                    lines.append(f"sqlstar_query_{name}_total{{{labels}}} "
+                                 f"{getattr(series, name)}")
+            pool_wait = [
+                "# HELP sqlstar_pool_wait_seconds Time to check out a pooled "
+                "connection",
+                "# TYPE sqlstar_pool_wait_seconds histogram"
+            ] + self._histogram_lines("sqlstar_pool_wait_seconds", "",
+                                      self._pool_wait)
+        lines = latency + [line for lines in counters.values()
+                           for line in lines] + pool_wait
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> str:
+        """Write the registry for node_exporter's textfile collector, the
+        file is replaced atomically
+
+        :return: path
+        """
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+        return path
+
+    def serve(self, port: int = 9464, addr: str = "127.0.0.1"):
+        """Serve the registry over HTTP from a daemon thread
+
+        :return: the http.server, `shutdown()` stops it
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        threading.Thread(target=server.serve_forever,
+                         name="sqlstar-metrics",
+                         daemon=True).start()
+        return server
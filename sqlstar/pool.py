@@ -0,0 +1,478 @@
+# *_*coding:utf-8 *_*
+import asyncio
+import collections
+import logging
+import threading
+import time
+import typing
+
+logger = logging.getLogger("sqlstar.pool")
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PoolClosed(Exception):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ("connection", "created_at", "last_used")
+
+    def __init__(self, connection: typing.Any):
+        self.connection = connection
+        self.created_at = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of DB-API connections
+
+    :param connect: callable returning a new driver connection
+    :param check: callable raising if a connection is no longer usable,
+                  it's called on checkout for connections idle longer than
+                  ``ping_interval`` seconds
+    :param close: callable closing a driver connection
+    :param min_size: connections opened eagerly by :meth:`open`
+    :param max_size: upper bound of connections opened at the same time
+    :param timeout: seconds :meth:`acquire` waits for a free connection
+    :param max_idle: seconds after which an idle connection is recycled
+    :param max_lifetime: seconds after which a connection is replaced, even
+                         if it's busy all the time
+    :param ping_interval: idle seconds after which checkout pings first
+    """
+
+    def __init__(self,
+                 connect: typing.Callable[[], typing.Any],
+                 check: typing.Callable[[typing.Any], typing.Any] = None,
+                 close: typing.Callable[[typing.Any], typing.Any] = None,
+                 min_size: int = 1,
+                 max_size: int = 10,
+                 timeout: float = 30.0,
+                 max_idle: float = 600.0,
+                 max_lifetime: float = 3600.0,
+                 ping_interval: float = 5.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, "
+                             f"max_size={max_size}")
+        self._connect = connect
+        self._check = check
+        self._close = close
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition(threading.Lock())
+        # most recently released connections sit at the right end, so
+        # checkout reuses warm connections and lets cold ones expire
+        self._idle = collections.deque(
+        )  # type: typing.Deque[_PooledConnection]
+        self._in_use = {}  # type: typing.Dict[int, _PooledConnection]
+        self._size = 0
+        self._closed = True
+        self._stats = collections.Counter()  # type: typing.Counter[str]
+
+    def open(self) -> None:
+        """Open the pool and fill it up to ``min_size`` connections"""
+        with self._cond:
+            self._closed = False
+            self._stats.clear()
+        for _ in range(self.min_size):
+            with self._cond:
+                if self._size >= self.min_size:
+                    break
+                self._size += 1
+            try:
+                entry = _PooledConnection(self._connect())
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._stats["connections_num"] += 1
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def close(self) -> None:
+        """Close idle connections, busy ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), collections.deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_connection(entry.connection)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def get_stats(self) -> typing.Dict[str, int]:
+        """Return the pool's gauges and counters
+
+        ``pool_size``, ``pool_available`` and ``requests_waiting`` describe
+        the pool right now; ``requests_num``, ``requests_queued``,
+        ``requests_wait_ms``, ``requests_errors``, ``connections_num``,
+        ``connections_errors`` and ``connections_lost`` count since
+        :meth:`open`.
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pool_min"] = self.min_size
+            stats["pool_max"] = self.max_size
+            stats["pool_size"] = self._size
+            stats["pool_available"] = len(self._idle)
+            stats.setdefault("requests_waiting", 0)
+        return stats
+
+    def acquire(self, timeout: float = None) -> typing.Any:
+        """Check a connection out of the pool
+
+        :param timeout: seconds to wait for a free connection, defaults to
+                        the pool's ``timeout``
+        :raise PoolTimeout: no connection became available in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            entry, expired = self._checkout(deadline, timeout)
+            for connection in expired:
+                self._close_connection(connection)
+            if entry is None:
+                entry = self._open_connection()
+            elif not self._is_alive(entry):
+                self._discard(entry)
+                continue
+            with self._cond:
+                self._in_use[id(entry.connection)] = entry
+            return entry.connection
+
+    def release(self, connection: typing.Any, discard: bool = False) -> None:
+        """Return a connection to the pool
+
+        :param connection: connection obtained from :meth:`acquire`
+        :param discard: close the connection instead of reusing it
+        """
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                raise ValueError("Connection does not belong to this pool")
+            if not (discard or self._closed or self._expired(entry)):
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+        self._discard(entry)
+
+    def _checkout(self, deadline: float, timeout: float):
+        """Pop an idle connection, or reserve a slot to open a new one
+
+        :return: the idle entry, or None when a new connection must be
+                 opened, and the expired connections to close
+        """
+        expired = []
+        waiting_since = None
+        with self._cond:
+            self._stats["requests_num"] += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolClosed("Connection pool is closed")
+                    while self._idle:
+                        entry = self._idle.pop()
+                        if not self._expired(entry):
+                            return entry, expired
+                        self._size -= 1
+                        expired.append(entry.connection)
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None, expired
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["requests_errors"] += 1
+                        raise PoolTimeout(
+                            f"No connection available within {timeout}s "
+                            f"(max_size={self.max_size})")
+                    if waiting_since is None:
+                        waiting_since = time.monotonic()
+                        self._stats["requests_waiting"] += 1
+                        self._stats["requests_queued"] += 1
+                    self._cond.wait(remaining)
+            finally:
+                if waiting_since is not None:
+                    self._stats["requests_waiting"] -= 1
+                    self._stats["requests_wait_ms"] += int(
+                        (time.monotonic() - waiting_since) * 1000)
+
+    def _expired(self, entry: _PooledConnection) -> bool:
+        now = time.monotonic()
+        return (now - entry.last_used >= self.max_idle
+                or now - entry.created_at >= self.max_lifetime)
+
+    def _open_connection(self) -> _PooledConnection:
+        try:
+            entry = _PooledConnection(self._connect())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._stats["connections_errors"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["connections_num"] += 1
+        return entry
+
+    def _is_alive(self, entry: _PooledConnection) -> bool:
+        if self._check is None:
+            return True
+        if time.monotonic() - entry.last_used < self.ping_interval:
+            return True
+        try:
+            self._check(entry.connection)
+            return True
+        except Exception:
+            logger.debug("Discarding broken connection", exc_info=True)
+            with self._cond:
+                self._stats["connections_lost"] += 1
+            return False
+
+    def _discard(self, entry: _PooledConnection) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self._close_connection(entry.connection)
+
+    def _close_connection(self, connection: typing.Any) -> None:
+        if self._close is None:
+            return
+        try:
+            self._close(connection)
+        except Exception:
+            logger.debug("Error closing connection", exc_info=True)
+
+
+class AsyncConnectionPool:
+    """A bounded pool of asyncio driver connections
+
+    Same settings and statistics as :class:`ConnectionPool`, but
+    ``connect``, ``check`` and ``close`` are coroutine functions and
+    waiting for a free connection doesn't block the event loop.
+    """
+
+    def __init__(self,
+                 connect: typing.Callable[[], typing.Awaitable],
+                 check: typing.Callable[[typing.Any], typing.Awaitable] = None,
+                 close: typing.Callable[[typing.Any], typing.Awaitable] = None,
+                 min_size: int = 1,
+                 max_size: int = 10,
+                 timeout: float = 30.0,
+                 max_idle: float = 600.0,
+                 max_lifetime: float = 3600.0,
+                 ping_interval: float = 5.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, "
+                             f"max_size={max_size}")
+        self._connect = connect
+        self._check = check
+        self._close = close
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._cond = None  # type: typing.Optional[asyncio.Condition]
+        self._idle = collections.deque(
+        )  # type: typing.Deque[_PooledConnection]
+        self._in_use = {}  # type: typing.Dict[int, _PooledConnection]
+        self._size = 0
+        self._closed = True
+        self._stats = collections.Counter()  # type: typing.Counter[str]
+
+    async def open(self) -> None:
+        """Open the pool and fill it up to ``min_size`` connections"""
+        # bind the condition to the running loop
+        self._cond = asyncio.Condition()
+        self._closed = False
+        self._stats.clear()
+        while self._size < self.min_size:
+            self._size += 1
+            entry = await self._open_connection()
+            async with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    async def close(self) -> None:
+        """Close idle connections, busy ones are closed when released"""
+        async with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), collections.deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            await self._close_connection(entry.connection)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def get_stats(self) -> typing.Dict[str, int]:
+        """Return the pool's gauges and counters, see
+        :meth:`ConnectionPool.get_stats`
+        """
+        stats = dict(self._stats)
+        stats["pool_min"] = self.min_size
+        stats["pool_max"] = self.max_size
+        stats["pool_size"] = self._size
+        stats["pool_available"] = len(self._idle)
+        stats.setdefault("requests_waiting", 0)
+        return stats
+
+    async def acquire(self, timeout: float = None) -> typing.Any:
+        """Check a connection out of the pool
+
+        :raise PoolTimeout: no connection became available in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            entry, expired = await self._checkout(deadline, timeout)
+            for connection in expired:
+                await self._close_connection(connection)
+            if entry is None:
+                entry = await self._open_connection()
+            elif not await self._is_alive(entry):
+                await self._discard(entry)
+                continue
+            self._in_use[id(entry.connection)] = entry
+            return entry.connection
+
+    async def release(self,
+                      connection: typing.Any,
+                      discard: bool = False) -> None:
+        """Return a connection to the pool
+
+        :param connection: connection obtained from :meth:`acquire`
+        :param discard: close the connection instead of reusing it
+        """
+        entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            raise ValueError("Connection does not belong to this pool")
+        if not (discard or self._closed or self._expired(entry)):
+            entry.last_used = time.monotonic()
+            async with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+            return
+        await self._discard(entry)
+
+    async def _checkout(self, deadline: float, timeout: float):
+        expired = []
+        waiting_since = None
+        async with self._cond:
+            self._stats["requests_num"] += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolClosed("Connection pool is closed")
+                    while self._idle:
+                        entry = self._idle.pop()
+                        if not self._expired(entry):
+                            return entry, expired
+                        self._size -= 1
+                        expired.append(entry.connection)
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None, expired
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["requests_errors"] += 1
+                        raise PoolTimeout(
+                            f"No connection available within {timeout}s "
+                            f"(max_size={self.max_size})")
+                    if waiting_since is None:
+                        waiting_since = time.monotonic()
+                        self._stats["requests_waiting"] += 1
+                        self._stats["requests_queued"] += 1
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if waiting_since is not None:
+                    self._stats["requests_waiting"] -= 1
+                    self._stats["requests_wait_ms"] += int(
+                        (time.monotonic() - waiting_since) * 1000)
+
+    def _expired(self, entry: _PooledConnection) -> bool:
+        now = time.monotonic()
+        return (now - entry.last_used >= self.max_idle
+                or now - entry.created_at >= self.max_lifetime)
+
+    async def _open_connection(self) -> _PooledConnection:
+        try:
+            entry = _PooledConnection(await self._connect())
+        except Exception:
+            self._size -= 1
+            self._stats["connections_errors"] += 1
+            async with self._cond:
+                self._cond.notify()
+            raise
+        self._stats["connections_num"] += 1
+        return entry
+
+    async def _is_alive(self, entry: _PooledConnection) -> bool:
+        if self._check is None:
+            return True
+        if time.monotonic() - entry.last_used < self.ping_interval:
+            return True
+        try:
+            await self._check(entry.connection)
+            return True
+        except Exception:
+            logger.debug("Discarding broken connection", exc_info=True)
+            self._stats["connections_lost"] += 1
+            return False
+
+    async def _discard(self, entry: _PooledConnection) -> None:
+        self._size -= 1
+        async with self._cond:
+            self._cond.notify()
+        await self._close_connection(entry.connection)
+
+    async def _close_connection(self, connection: typing.Any) -> None:
+        if self._close is None:
+            return
+        try:
+            await self._close(connection)
+        except Exception:
+            logger.debug("Error closing connection", exc_info=True)
+
+
+POOL_OPTIONS = {
+    "min_size": int,
+    "max_size": int,
+    "timeout": float,
+    "max_idle": float,
+    "max_lifetime": float,
+    "ping_interval": float,
+}
+
+
+def get_pool_kwargs(url_options: dict, options: dict) -> dict:
+    """Collect pool settings from the url query and `Database` options,
+    the latter take precedence
+
+    >>> Database('mysql://localhost/db?min_size=2&max_size=20')
+    >>> Database('mysql://localhost/db', max_size=20, timeout=5)
+    """
+    kwargs = {}
+    for source in (url_options, options):
+        for key, cast in POOL_OPTIONS.items():
+            if source.get(key) is not None:
+                kwargs[key] = cast(source[key])
+    return kwargs
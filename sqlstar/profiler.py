@@ -0,0 +1,166 @@
+# *_*coding:utf-8 *_*
+import threading
+import typing
+
+from sqlstar.cache import normalize_query
+from sqlstar.metrics import Observer, QueryEvent
+
+
+class ProfiledStatement:
+    """A backend call captured by a `Profiler`"""
+    __slots__ = ("operation", "query", "params", "table", "wall", "decode",
+                 "rows", "error", "thread", "plan")
+
+    def __init__(self, event: QueryEvent):
+        self.operation = event.operation
+        self.query = event.query
+        self.params = event.params
+        self.table = event.table
+        self.wall = event.seconds
+        self.decode = event.decode_seconds
+        self.rows = event.rows
+        self.error = event.error
+        self.thread = threading.current_thread().name
+        self.plan = None  # type: typing.Optional[str]
+
+    @property
+    def driver(self) -> float:
+        """Seconds in the driver, the network and the server"""
+        return max(self.wall - self.decode, 0.0)
+
+    @property
+    def statement(self) -> str:
+        """The query, or the operation and table of table methods"""
+        if self.query is None:
+            return f"{self.operation} {self.table}"
+        if isinstance(self.query, str):
+            return normalize_query(self.query)
+        return "; ".join(normalize_query(query) for query in self.query)
+
+    def __repr__(self) -> str:
+        return (f"ProfiledStatement({self.operation}, {self.statement[:60]!r},"
+                f" wall={self.wall:.4f}, decode={self.decode:.4f})")
+
+
+class Profiler(Observer):
+    """Capture every statement sent through a `Database`
+
+    Usually created by `Database.profile`. The wall time of every backend
+    call is split into decode time, spent converting rows to or from
+    Dataframes, Arrow or files in python, and driver time, spent in the
+    driver, the network and the server. Statements slower than `threshold`
+    get their plan attached when the block exits.
+
+    >>> with db.profile(threshold=0.5, cprofile='job.prof') as prof:
+    ...     run_job(db)
+    >>> print(prof.report())
+    """
+
+    def __init__(self, threshold: float = 0.1):
+        """
+        :param threshold: seconds from which a statement is explained
+        """
+        self.threshold = threshold
+        self.statements = []  # type: typing.List[ProfiledStatement]
+        # pstats.Stats of the python side, with ``cprofile``
+        self.stats = None
+        self._lock = threading.Lock()
+
+    def on_query(self, event: QueryEvent) -> None:
+        with self._lock:
+            self.statements.append(ProfiledStatement(event))
+
+    def slow(self) -> typing.List[ProfiledStatement]:
+        """Statements over the threshold, slowest first"""
+        return sorted(
+            (s for s in self.statements if s.wall >= self.threshold),
+            key=lambda s: s.wall,
+            reverse=True)
+
+    def explain(self, explain: typing.Callable[[str, typing.Any], str]) -> None:
+        """Attach plans to the slow statements, each distinct statement is
+        explained once
+
+        :param explain: callable taking a query and its params, e.g.
+                        `Database.explain`
+        """
+        plans = {}  # type: typing.Dict[typing.Tuple[str, str], str]
+        for statement in self.slow():
+            if not isinstance(statement.query, str):
+                continue
+            key = (statement.query, repr(statement.params))
+            if key not in plans:
+                try:
+                    plans[key] = explain(statement.query, statement.params)
+                except Exception as exc:
+                    plans[key] = f"EXPLAIN failed: {exc}"
+            statement.plan = plans[key]
+
+    def ranked(self) -> typing.List[dict]:
+        """Statements grouped by normalized text, by total wall time
+
+        :return: dicts of statement, operation, count, errors, wall, driver,
+                 decode, max and rows, with the plan of the slowest one
+        """
+        groups = {}  # type: typing.Dict[typing.Tuple[str, str], dict]
+        with self._lock:
+            statements = list(self.statements)
+        for s in statements:
+            group = groups.get((s.operation, s.statement))
+            if group is None:
+                group = groups[(s.operation, s.statement)] = {
+                    "statement": s.statement,
+                    "operation": s.operation,
+                    "count": 0,
+                    "errors": 0,
+                    "wall": 0.0,
+                    "driver": 0.0,
+                    "decode": 0.0,
+                    "max": 0.0,
+                    "rows": 0,
+                    "plan": None,
+                }
+            group["count"] += 1
+            group["errors"] += s.error is not None
+            group["wall"] += s.wall
+            group["driver"] += s.driver
+            group["decode"] += s.decode
+            group["rows"] += s.rows
+            if s.wall >= group["max"]:
+                group["max"] = s.wall
+                group["plan"] = s.plan or group["plan"]
+        return sorted(groups.values(), key=lambda g: g["wall"], reverse=True)
+
+    def report(self, limit: int = 20, width: int = 100) -> str:
+        """Ranked text report, with the plans of the slow statements and the
+        top python functions when cProfile ran
+        """
+        ranked = self.ranked()
+        total = sum(group["wall"] for group in ranked)
+        lines = [
+            f"{len(self.statements)} statements, {total:.3f}s in the "
+            f"database calls",
+            f"{'#':>3} {'count':>6} {'wall':>9} {'driver':>9} {'decode':>9} "
+            f"{'max':>9} {'rows':>9}  {'operation':<19} statement"
+        ]
+        for rank, group in enumerate(ranked[:limit], 1):
+            statement = group["statement"]
+            if len(statement) > width:
+                statement = statement[:width - 3] + "..."
+            lines.append(f"{rank:>3} {group['count']:>6} "
+                         f"{group['wall']:>9.4f} {group['driver']:>9.4f} "
+                         f"{group['decode']:>9.4f} {group['max']:>9.4f} "
+                         f"{group['rows']:>9}  {group['operation']:<19} "
+                         f"{statement}")
+            if group["errors"]:
+                lines.append(f"{'':>11}{group['errors']} failed")
+            if group["plan"]:
+                lines.extend(f"{'':>11}| {line}"
+                             for line in group["plan"].splitlines())
+        if self.stats is not None:
+            import io
+            stream = io.StringIO()
+            self.stats.stream = stream
+            self.stats.sort_stats("cumulative").print_stats(limit)
+            lines.extend(["", "python side:", stream.getvalue().strip()])
+        return "\n".join(lines)
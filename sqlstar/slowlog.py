@@ -0,0 +1,230 @@
+# *_*coding:utf-8 *_*
+import datetime
+import functools
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import typing
+
+from sqlstar.metrics import Observer, QueryEvent
+
+_COMMENT = re.compile(r"/\*.*?\*/|(?:--|#)[^\n]*", re.DOTALL)
+# single quoted only, double quotes are identifiers on Postgres
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+\b|\?")
+_NUMBER = re.compile(r"(?<![\w$.])-?(?:0x[0-9a-f]+|\d+(?:\.\d*)?(?:e[+-]?\d+)?)"
+                     r"(?![\w$])")
+_IN_LIST = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(
+    r"\bvalues\s*\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+_SPACE = re.compile(r"\s+")
+
+# reservoir of timings kept per fingerprint for the percentiles
+RESERVOIR_SIZE = 256
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(query: str) -> str:
+    """Normalize a statement so that queries differing only by literals
+    match, like pt-query-digest does
+
+    >>> fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'x'")
+    'select * from t where id in (?+) and name = ?'
+    """
+    query = _COMMENT.sub(" ", _STRING.sub("?", query))
+    query = _SPACE.sub(" ", query).strip().rstrip(";").strip().lower()
+    query = _NUMBER.sub("?", _PLACEHOLDER.sub("?", query))
+    query = _IN_LIST.sub("in (?+)", query)
+    return _VALUES_LIST.sub("values (?+)", query)
+
+
+def fingerprint_id(text: str) -> str:
+    """Short checksum naming a fingerprint"""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()[:16]
+
+
+def event_fingerprint(event: QueryEvent) -> str:
+    if event.query is None:
+        # table methods, e.g. insert_df
+        return f"{event.operation} {event.table}"
+    if isinstance(event.query, str):
+        return fingerprint(event.query)
+    return "; ".join(fingerprint(query) for query in event.query)
+
+
+class _Digest:
+    __slots__ = ("fingerprint", "count", "errors", "total", "max", "rows",
+                 "slow", "samples")
+
+    def __init__(self, text: str):
+        self.fingerprint = text
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.samples = []  # type: typing.List[float]
+
+    def add(self, event: QueryEvent) -> None:
+        self.count += 1
+        self.errors += event.error is not None
+        self.total += event.seconds
+        self.rows += event.rows
+        # reservoir sampling keeps a uniform sample of the timings
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(event.seconds)
+        else:
+            i = random.randrange(self.count)
+            if i < RESERVOIR_SIZE:
+                self.samples[i] = event.seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+class SlowQueryLog(Observer):
+    """Continuous, sampled digest of the statements run through a
+    `Database`, and a rotating JSONL log of the slow ones
+
+    A `sample_rate` share of the statements is fingerprinted and aggregated,
+    so counts, totals and percentiles are those of an unbiased sample.
+    Statements slower than `threshold` are all counted and logged.
+
+    >>> db = Database(url, slow_log=SlowQueryLog('slow.jsonl', threshold=1))
+    >>> db.slow_log.top(5)
+    [{'id': '3f2a...', 'fingerprint': 'select * from orders where id = ?',
+      'count': 1840, 'total': 12.4, 'p50': 0.004, 'p95': 0.02, ...}]
+    """
+
+    def __init__(self,
+                 path: str = None,
+                 threshold: float = 1.0,
+                 sample_rate: float = 0.1,
+                 max_bytes: int = 64 * 1024**2,
+                 backup_count: int = 5,
+                 max_fingerprints: int = 1000,
+                 log_params: bool = False):
+        """
+        :param path: JSONL file of the slow statements, None keeps the
+                     digest only
+        :param threshold: seconds from which a statement is logged
+        :param sample_rate: share of the statements aggregated, 0 to 1
+        :param max_bytes: size at which the log rotates
+        :param backup_count: rotated files kept, slow.jsonl.1, ...
+        :param max_fingerprints: digests kept, later ones go to '<other>'
+        :param log_params: log the query parameters, off as they may hold
+                           personal data
+        """
+        self.path = path
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.max_fingerprints = max_fingerprints
+        self.log_params = log_params
+        self._digests = {}  # type: typing.Dict[str, _Digest]
+        self._lock = threading.Lock()
+        self._handler = None
+        if path is not None:
+            path = os.path.expanduser(path)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            import logging.handlers
+            self._handler = logging.handlers.RotatingFileHandler(
+                path,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding="utf-8")
+
+    def on_query(self, event: QueryEvent) -> None:
+        sampled = random.random() < self.sample_rate
+        slow = event.seconds >= self.threshold
+        if not sampled and not slow:
+            return
+        text = event_fingerprint(event)
+        with self._lock:
+            digest = self._digests.get(text)
+            if digest is None:
+                key = text
+                if len(self._digests) >= self.max_fingerprints:
+                    key = "<other>"
+                    digest = self._digests.get(key)
+                if digest is None:
+                    digest = self._digests[key] = _Digest(key)
+            if sampled:
+                digest.add(event)
+            if slow:
+                digest.slow += 1
+            if event.seconds > digest.max:
+                digest.max = event.seconds
+        if slow and self._handler is not None:
+            self._write(event, text)
+
+    def _write(self, event: QueryEvent, text: str) -> None:
+        entry = {
+            "time": datetime.datetime.now(
+                datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "id": fingerprint_id(text),
+            "fingerprint": text,
+            "operation": event.operation,
+            "table": event.table,
+            "seconds": round(event.seconds, 6),
+            "driver_seconds": round(event.driver_seconds, 6),
+            "decode_seconds": round(event.decode_seconds, 6),
+            "rows": event.rows,
+            "error": repr(event.error) if event.error is not None else None,
+        }
+        if self.log_params:
+            entry["query"] = event.query
+            entry["params"] = event.params
+        record = logging.LogRecord("sqlstar.slowlog", logging.WARNING,
+                                   __file__, 0,
+                                   json.dumps(entry, default=str), None,
+                                   None)
+        self._handler.handle(record)
+
+    def top(self, limit: int = 20, by: str = "total") -> typing.List[dict]:
+        """Digests of the heaviest fingerprints
+
+        `count`, `total` and the percentiles are those of the sample,
+        `estimated` scales the count back by the sample rate, `slow` and
+        `max` cover every statement.
+
+        :param by: 'total', 'count', 'slow', 'max', 'p50', 'p95' or 'p99'
+        """
+        with self._lock:
+            digests = [self._summary(d) for d in self._digests.values()]
+        digests.sort(key=lambda d: d[by], reverse=True)
+        return digests[:limit]
+
+    def _summary(self, digest: _Digest) -> dict:
+        return {
+            "id": fingerprint_id(digest.fingerprint),
+            "fingerprint": digest.fingerprint,
+            "count": digest.count,
+            "estimated": round(digest.count / self.sample_rate)
+            if self.sample_rate else 0,
+            "slow": digest.slow,
+            "errors": digest.errors,
+            "total": digest.total,
+            "max": digest.max,
+            "p50": digest.quantile(0.5),
+            "p95": digest.quantile(0.95),
+            "p99": digest.quantile(0.99),
+            "rows": digest.rows,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._digests.clear()
+
+    def close(self) -> None:
+        if self._handler is not None:
+            self._handler.close()
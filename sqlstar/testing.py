@@ -0,0 +1,214 @@
+# *_*coding:utf-8 *_*
+"""In-process stand-in of a MySQL server for the tests and benchmarks
+
+It takes the place of ``pymysql.connect``, so the MySQL backend runs its
+real code on the way out: statements are built and escaped by pymysql's
+converters. Writes are counted and dropped, SELECTs return the result set
+registered with `StandIn.result` as ready-made python tuples, so the
+network, the server and pymysql's packet decoding are all left out.
+Queries over `StandIn.max_allowed_packet` are refused like the server does.
+"""
+import contextlib
+import itertools
+import re
+
+import pymysql
+from pymysql.constants import CLIENT, FIELD_TYPE, SERVER_STATUS
+from pymysql.converters import escape_item, escape_string
+
+_SELECT = re.compile(r"\s*\(?\s*SELECT\b", re.IGNORECASE)
+
+
+class StandInCursor:
+
+    def __init__(self, connection: "StandInConnection"):
+        self._connection = connection
+        self._server = connection._server
+        self._results = []
+        self._rows = ()
+        self._position = 0
+        self.description = None
+        self.rowcount = -1
+
+    def mogrify(self, query, args=None):
+        if args is None:
+            return query
+        if isinstance(args, dict):
+            return query % {k: escape_item(v, "utf8") for k, v in args.items()}
+        return query % tuple(escape_item(v, "utf8") for v in args)
+
+    def execute(self, query, args=None):
+        query = self.mogrify(query, args)
+        self._server.statements += 1
+        self._server.bytes_sent += len(query)
+        if self._server.queries is not None:
+            self._server.queries.append(query)
+        if len(query.encode("utf8")) > self._server.max_allowed_packet:
+            raise pymysql.err.OperationalError(
+                1153, "Got a packet bigger than 'max_allowed_packet' bytes")
+        # with CLIENT.MULTI_STATEMENTS, every statement of the query gets its
+        # own result, read with nextset; statements are split on every `;`
+        if self._connection.client_flag & CLIENT.MULTI_STATEMENTS:
+            statements = query.split(";")
+        else:
+            statements = [query]
+        self._results = [self._run(statement) for statement in statements]
+        self.nextset()
+        return self.rowcount
+
+    def _run(self, query):
+        """(columns, rows, rowcount) of a single statement"""
+        for pattern in self._server.failures:
+            if pattern.search(query):
+                raise pymysql.err.OperationalError(1205,
+                                                   f"Stand-in failure: {query}")
+        if query.lstrip().upper().startswith("SELECT @@MAX_ALLOWED_PACKET"):
+            rows = ((self._server.max_allowed_packet, ), )
+            return (("@@max_allowed_packet", FIELD_TYPE.LONGLONG), ), rows, 1
+        if _SELECT.match(query):
+            columns, rows = self._server.result_set
+            return columns, rows, len(rows)
+        # a multi-row INSERT affects one row per VALUES tuple
+        return None, (), query.count("),(") + 1 if " VALUES " in query else 0
+
+    def _set(self, columns, rows, rowcount):
+        # like pymysql, the length stands for internal size and precision
+        self.description = [
+            (name, code, None, length, length, scale, True)
+            for name, code, length, scale in ((tuple(column) +
+                                               (None, None))[:4]
+                                              for column in columns)
+        ] if columns else None
+        self._rows = rows
+        self._position = 0
+        self.rowcount = rowcount
+
+    def executemany(self, query, args):
+        return sum(self.execute(query, row) for row in args)
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return tuple(rows)
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return tuple(rows)
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def nextset(self):
+        if not self._results:
+            return None
+        self._set(*self._results.pop(0))
+        return True
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class StandInConnection:
+    encoding = "utf8"
+
+    def __init__(self, server: "StandIn", client_flag: int = 0):
+        self._server = server
+        self.client_flag = client_flag
+        self.open = True
+        self.server_status = SERVER_STATUS.SERVER_STATUS_AUTOCOMMIT
+
+    def cursor(self, cursor=None):
+        return StandInCursor(self)
+
+    def escape(self, obj, mapping=None):
+        return escape_item(obj, "utf8", mapping)
+
+    def literal(self, obj):
+        return self.escape(obj)
+
+    def escape_string(self, s):
+        return escape_string(s)
+
+    def ping(self, reconnect=False):
+        if not self.open:
+            raise pymysql.err.InterfaceError(0, "")
+
+    def begin(self):
+        self.server_status |= SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def commit(self):
+        if next(self._server.commit_calls) in self._server.commit_failures:
+            raise pymysql.err.OperationalError(
+                2013, "Stand-in lost the connection during COMMIT")
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+        self._server.commits += 1
+
+    def rollback(self):
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+        self._server.rollbacks += 1
+
+    def close(self):
+        self.open = False
+
+
+class StandIn:
+    """Counts what the backend sends and serves one canned result set
+
+    >>> server = StandIn()
+    >>> server.result([('id', FIELD_TYPE.LONGLONG)], [(1, ), (2, )])
+    >>> with server.installed():
+    ...     db = Database('mysql://bench@standin/bench')
+    """
+
+    def __init__(self,
+                 max_allowed_packet: int = 64 * 1024**2,
+                 record: bool = False):
+        """
+        :param record: keep the statements sent in `queries`, off for the
+                       benchmarks as it adds to their peak memory
+        """
+        self.max_allowed_packet = max_allowed_packet
+        self.result_set = ((), ())
+        self.statements = 0
+        self.bytes_sent = 0
+        self.queries = [] if record else None
+        self.failures = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.commit_calls = itertools.count(1)
+        self.commit_failures = set()
+
+    def result(self, columns: list, rows: list) -> None:
+        """Rows returned by every SELECT, columns are (name, type code) or
+        (name, type code, length, scale)
+        """
+        self.result_set = (tuple(columns), tuple(rows))
+
+    def fail(self, pattern: str) -> None:
+        """Raise an OperationalError on the statements matching `pattern`"""
+        self.failures.append(re.compile(pattern, re.IGNORECASE | re.DOTALL))
+
+    def fail_commit(self, nth: int) -> None:
+        """Raise an OperationalError on the `nth` COMMIT, counting from 1"""
+        self.commit_failures.add(nth)
+
+    def connect(self, client_flag: int = 0, **kwargs):
+        return StandInConnection(self, client_flag)
+
+    @contextlib.contextmanager
+    def installed(self):
+        """Route ``pymysql.connect`` to the stand-in"""
+        connect = pymysql.connect
+        pymysql.connect = self.connect
+        try:
+            yield self
+        finally:
+            pymysql.connect = connect
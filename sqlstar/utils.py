@@ -1,5 +1,53 @@
 # *_*coding:utf-8 *_*
-import pandas as pd
+import contextlib
+import contextvars
+import datetime
+import functools
+import itertools
+import time
+import typing
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+# seconds the current backend call spent converting between rows and
+# Dataframes, Arrow or files, set while observers are listening
+DECODE_SECONDS = contextvars.ContextVar("decode_seconds", default=None)
+
+
+@contextlib.contextmanager
+def decoding():
+    """Count the block as client-side decoding of the current backend call"""
+    timer = DECODE_SECONDS.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer[0] += time.perf_counter() - start
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """Run a CPU-bound call, e.g. Dataframe encoding, on the loop's default
+    executor so other tasks keep running, context variables included
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args,
+                             **kwargs)
+    return await loop.run_in_executor(None, call)
+
+
+def encode_records(df: "pd.DataFrame", dropna=False, **kwargs):
+    """`df_to_records` with the rows encoded up front
+
+    :return: (columns, list of row tuples)
+    """
+    cols, data = df_to_records(df, dropna, **kwargs)
+    return cols, list(data)
 
 
 def check_dtype_postgre(pdtype):
@@ -34,6 +82,8 @@ def check_dtype_mysql(pdtype, max_content_len, charset_len=4, min_len=4):
     Returns:
         str: 对应的MySQL数据类型
     """
+    import pandas as pd
+
     max_content_len = min_len if pd.isna(max_content_len) else max_content_len
     # 考虑冗余空间
     max_content_len = max(min_len, int(max_content_len * 2))
@@ -109,3 +159,226 @@ def _get_binary_type(length):
     if length <= 16777215:
         return 'MEDIUMBLOB'
     return 'LONGBLOB'
+
+
+NULL_LIKE_VALUES = ['None', 'NULL', 'NAN', 'NA', 'nan', 'na', 'null']
+
+
+def _encode_column(series: "pd.Series", null_values=None) -> list:
+    """Convert a column into a list of python values in bulk
+
+    Missing values (None, NaN, NaT, pd.NA) and `null_values` become None,
+    numpy scalars become python scalars and datetime64 columns become
+    `datetime.datetime` objects.
+    """
+    import numpy as np
+    import pandas as pd
+
+    dtype = series.dtype
+    mask = series.isna().to_numpy()
+    if null_values and (dtype == object or pd.api.types.is_string_dtype(dtype)
+                        or isinstance(dtype, pd.CategoricalDtype)):
+        mask = mask | series.isin(null_values).to_numpy()
+
+    if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+        # bool, int and float, only floats can hold NaN
+        values = series.to_numpy().tolist()
+    elif isinstance(dtype, np.dtype) and dtype.kind == "M":
+        values = series.to_numpy().astype("datetime64[us]").astype(
+            object).tolist()
+    elif isinstance(dtype, np.dtype) and dtype.kind == "m":
+        values = series.to_numpy().astype("timedelta64[us]").astype(
+            object).tolist()
+    else:
+        # object, category and extension dtypes (Int64, boolean, string, tz
+        # aware datetimes, ...)
+        values = series.to_numpy(dtype=object).tolist()
+
+    for index in np.flatnonzero(mask).tolist():
+        values[index] = None
+    return values
+
+
+def encode_df(df: "pd.DataFrame",
+              null_values: list = None,
+              batch_size: int = 10000):
+    """Encode a Dataframe into row tuples, column by column
+
+    Nothing is copied beyond one batch of python objects at a time.
+
+    :param df: Dataframe
+    :param null_values: values sent as NULL besides NaN/NaT/None
+    :param batch_size: rows per batch
+    :return: iterator of lists of row tuples
+    """
+    for start in range(0, len(df), batch_size):
+        with decoding():
+            chunk = df.iloc[start:start + batch_size]
+            columns = [
+                _encode_column(chunk.iloc[:, i], null_values)
+                for i in range(chunk.shape[1])
+            ]
+            rows = list(zip(*columns))
+        yield rows
+
+
+def df_to_records(df: "pd.DataFrame",
+                  dropna=False,
+                  batch_size: int = 10000,
+                  **kwargs):
+    """Turn a Dataframe into column names and lazily encoded row tuples
+
+    :param df: Dataframe
+    :param dropna: drop missing values like `DataFrame.dropna`, otherwise
+                   they, and `NULL_LIKE_VALUES`, are sent as NULL
+    :param batch_size: rows encoded at a time
+    :return: (columns, iterator of row tuples)
+    """
+    cols = df.columns.tolist()
+    if dropna:
+        # pandas refuses `how` and `thresh` together, even if one is None
+        options = {
+            key: kwargs[key]
+            for key in ('axis', 'how', 'thresh', 'subset')
+            if kwargs.get(key) is not None
+        }
+        df = df.dropna(**options)
+        null_values = None
+    else:
+        null_values = NULL_LIKE_VALUES
+    batches = encode_df(df, null_values, batch_size)
+    return cols, itertools.chain.from_iterable(batches)
+
+
+def description_columns(description) -> list:
+    """Column names of a DB-API cursor description"""
+    return [column[0] for column in description or ()]
+
+
+def description_dtypes(description, type_dtypes: dict) -> dict:
+    """Map the columns of a DB-API cursor description to pandas dtypes
+
+    :param description: cursor description
+    :param type_dtypes: driver type code -> pandas dtype, codes not listed
+                        keep pandas' inference
+    :return: column name -> dtype
+    """
+    dtypes = {}
+    for column in description or ():
+        dtype = type_dtypes.get(column[1])
+        if dtype is not None:
+            dtypes[column[0]] = dtype
+    return dtypes
+
+
+def rows_to_df(rows, columns: list, dtypes: dict = None) -> "pd.DataFrame":
+    """Build a Dataframe from row tuples, casting columns to `dtypes`"""
+    import pandas as pd
+
+    with decoding():
+        df = pd.DataFrame.from_records(list(rows), columns=columns)
+        return df.astype(dtypes) if dtypes else df
+
+
+def fetch_batches(cursor, size: int):
+    """Yield lists of at most `size` rows from an executed cursor"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        yield rows
+
+
+def iter_statements(query, params_seq=None):
+    """Yield the (statement, params) pairs of an `execute_many` batch
+
+    :param query: one statement run with every parameter set of
+                  `params_seq`, or a list of statements, each a string or a
+                  (statement, params) pair
+    """
+    if isinstance(query, str):
+        if params_seq is None:
+            yield query, None
+        else:
+            for params in params_seq:
+                yield query, params
+        return
+    if params_seq is not None:
+        raise ValueError("params_seq goes with a single statement")
+    for statement in query:
+        if isinstance(statement, str):
+            yield statement, None
+        else:
+            yield tuple(statement)
+
+
+def iter_frames(cursor, columns: list, dtypes: dict, chunksize: int):
+    """Yield Dataframes of at most `chunksize` rows from an executed cursor
+
+    Every chunk is cast to the same `dtypes`, so a column doesn't flip
+    between e.g. int64 and float64 depending on whether a chunk has NULLs.
+    An empty result yields a single empty Dataframe.
+    """
+    empty = True
+    while True:
+        rows = cursor.fetchmany(chunksize)
+        if not rows:
+            break
+        empty = False
+        yield rows_to_df(rows, columns, dtypes)
+    if empty:
+        yield rows_to_df([], columns, dtypes)
+
+
+def format_timedelta(value: datetime.timedelta) -> str:
+    """Format a timedelta as a MySQL TIME literal, ``[-]HHH:MM:SS[.ffffff]``,
+    which Postgres reads as an interval too
+
+    >>> format_timedelta(datetime.timedelta(days=1, hours=2))
+    '26:00:00'
+    """
+    micros = (value.days * 86400 + value.seconds) * 10**6 + value.microseconds
+    sign = "-" if micros < 0 else ""
+    seconds, micros = divmod(abs(micros), 10**6)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    text = f"{sign}{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{text}.{micros:06d}" if micros else text
+
+
+def load_data_field(value) -> str:
+    """Encode a value as a field of MySQL's default LOAD DATA format
+
+    Fields are tab separated, rows newline terminated, backslash escapes
+    special characters and ``\\N`` stands for NULL (also the text format of
+    Postgres' COPY).
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, float) and value != value:
+        return "\\N"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if type(value).__name__ == "bool_":
+        # numpy.bool_, told apart by name so numpy isn't imported here
+        return "1" if value else "0"
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "surrogateescape")
+    elif isinstance(value, datetime.timedelta):
+        # before isoformat, pandas' Timedelta has an ISO 8601 one
+        value = format_timedelta(value)
+    elif hasattr(value, "isoformat"):
+        # datetime.datetime/date/time and pandas Timestamp, DATETIME columns
+        # take no offset, aware datetimes are written as naive UTC
+        if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(
+                tzinfo=None)
+        value = (value.isoformat(sep=" ")
+                 if hasattr(value, "hour") and hasattr(value, "year") else
+                 value.isoformat())
+    else:
+        value = str(value)
+    return (value.replace("\\", "\\\\").replace("\t", "\\t").replace(
+        "\n", "\\n").replace("\r", "\\r").replace("\0", "\\0"))
@@ -0,0 +1,38 @@
+# *_*coding:utf-8 *_*
+import pytest
+
+import sqlstar
+from sqlstar.testing import StandIn
+
+URL = "mysql://test@standin:3306/test"
+
+
+@pytest.fixture
+def standin():
+    """The in-process MySQL stand-in, recording the statements sent"""
+    server = StandIn(record=True)
+    with server.installed():
+        yield server
+
+
+@pytest.fixture
+def database(standin):
+    """Factory of connected Databases on the stand-in, e.g.
+    ``database(max_size=3)``
+    """
+    opened = []
+
+    def connect(**options):
+        db = sqlstar.Database(URL, **options)
+        db.connect()
+        opened.append(db)
+        return db
+
+    yield connect
+    for db in opened:
+        db.disconnect()
+
+
+@pytest.fixture
+def db(database):
+    return database()
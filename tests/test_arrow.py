@@ -0,0 +1,71 @@
+# *_*coding:utf-8 *_*
+import decimal
+
+import pyarrow as pa
+from pymysql.constants import FIELD_TYPE
+
+from sqlstar.arrow import record_batches, to_table, widen_type
+
+D = decimal.Decimal
+
+
+class Cursor:
+    """DB-API cursor over canned rows"""
+
+    def __init__(self, description, rows):
+        self.description = description
+        self._rows = list(rows)
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+def test_decimal_type_comes_from_the_description(db, standin):
+    # DECIMAL(7, 2), which pymysql describes with a length of 9
+    standin.result([("amount", FIELD_TYPE.NEWDECIMAL, 9, 2)],
+                   [(D("1.50"), ), (D("12345.67"), ), (None, )])
+    table = db.fetch_arrow("SELECT amount FROM t", batch_size=1)
+    assert pa.types.is_decimal(table.schema.field("amount").type)
+    assert table.schema.field("amount").type.scale == 2
+    assert table.column("amount").to_pylist() == [
+        D("1.50"), D("12345.67"), None
+    ]
+
+
+def test_wide_decimal_gets_decimal256(db, standin):
+    standin.result([("amount", FIELD_TYPE.NEWDECIMAL, 67, 30)],
+                   [(D("1" * 30 + "." + "2" * 30), )])
+    table = db.fetch_arrow("SELECT amount FROM t")
+    assert table.schema.field("amount").type == pa.decimal256(67, 30)
+
+
+def test_undeclared_decimals_are_widened_across_batches():
+    rows = [(D("1.5"), ), (D("12345.678"), ), (D("-98765432.1"), )]
+    batches = list(record_batches(Cursor([("x", 1700)], rows), 1, {}))
+    table = to_table(batches)
+    assert table.column("x").to_pylist() == [row[0] for row in rows]
+    scales = [batch.schema.field("x").type.scale for batch in batches]
+    assert scales == sorted(scales)
+
+
+def test_ints_then_floats_are_not_truncated():
+    rows = [(1, ), (2, ), (1.5, )]
+    table = to_table(record_batches(Cursor([("x", 0)], rows), 2, {}))
+    assert table.schema.field("x").type == pa.float64()
+    assert table.column("x").to_pylist() == [1.0, 2.0, 1.5]
+
+
+def test_null_leading_batches_take_the_later_type():
+    rows = [(None, ), (None, ), ("a", )]
+    table = to_table(record_batches(Cursor([("x", 0)], rows), 2, {}))
+    assert table.schema.field("x").type == pa.string()
+    assert table.column("x").to_pylist() == [None, None, "a"]
+
+
+def test_widen_type():
+    assert widen_type(None, pa.int64()) == pa.int64()
+    assert widen_type(pa.int64(), pa.null()) == pa.int64()
+    assert widen_type(pa.int64(), pa.float64()) == pa.float64()
+    assert widen_type(pa.decimal128(3, 1), pa.decimal128(8, 3)) == \
+        pa.decimal128(38, 3)
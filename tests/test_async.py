@@ -0,0 +1,16 @@
+# *_*coding:utf-8 *_*
+import sys
+
+import pytest
+
+import sqlstar
+
+from conftest import URL
+
+
+def test_missing_aiomysql_names_the_extra(monkeypatch):
+    monkeypatch.setitem(sys.modules, "aiomysql", None)
+    monkeypatch.delitem(sys.modules, "sqlstar.backends.mysql_async",
+                        raising=False)
+    with pytest.raises(ImportError, match=r"pip install sqlstar\[async\]"):
+        sqlstar.AsyncDatabase(URL)
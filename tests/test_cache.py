@@ -0,0 +1,89 @@
+# *_*coding:utf-8 *_*
+import pandas as pd
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from sqlstar.cache import DiskCache, QueryCache
+
+QUERY = "SELECT id, name FROM orders"
+
+
+@pytest.fixture
+def orders(standin):
+    standin.result([("id", FIELD_TYPE.LONGLONG),
+                    ("name", FIELD_TYPE.VAR_STRING)], [(1, "a"), (2, "b")])
+    return standin
+
+
+def selects(standin) -> int:
+    return sum(q.startswith("SELECT id") for q in standin.queries)
+
+
+@pytest.fixture(params=["memory", "disk", "both"])
+def cached_db(request, database, tmp_path):
+    options = {}
+    if request.param in ("memory", "both"):
+        options["cache"] = QueryCache()
+    if request.param in ("disk", "both"):
+        options["disk_cache"] = DiskCache(str(tmp_path))
+    return database(**options)
+
+
+def test_hit(cached_db, orders):
+    first = cached_db.fetch_df(QUERY)
+    pd.testing.assert_frame_equal(cached_db.fetch_df(QUERY), first)
+    assert selects(orders) == 1
+
+
+@pytest.mark.parametrize("write", [
+    lambda db: db.insert_df("orders", pd.DataFrame({"id": [3]})),
+    lambda db: db.insert_many("orders", [(3, "c")], ["id", "name"]),
+    lambda db: db.execute("UPDATE orders SET name = 'x'"),
+    lambda db: db.execute("OPTIMIZE something"),
+])
+def test_writes_invalidate_every_tier(cached_db, orders, write):
+    cached_db.fetch_df(QUERY)
+    write(cached_db)
+    cached_db.fetch_df(QUERY)
+    assert selects(orders) == 2
+
+
+def test_writes_to_other_tables_keep_entries(cached_db, orders):
+    cached_db.fetch_df(QUERY)
+    cached_db.execute("UPDATE customers SET name = 'x'")
+    cached_db.fetch_df(QUERY)
+    assert selects(orders) == 1
+
+
+def test_disk_invalidation_reaches_other_databases(database, orders,
+                                                   tmp_path):
+    reader = database(disk_cache=str(tmp_path))
+    writer = database(disk_cache=str(tmp_path))
+    reader.fetch_df(QUERY)
+    writer.execute("DELETE FROM orders WHERE id = 1")
+    reader.fetch_df(QUERY)
+    assert selects(orders) == 2
+
+
+def test_transaction_writes_invalidate_again_at_commit(cached_db, orders):
+    with cached_db.connection() as connection:
+        connection.begin()
+        connection.execute("UPDATE orders SET name = 'x'")
+        # cached from a connection which doesn't see the update yet
+        cached_db.fetch_df(QUERY)
+        connection.commit()
+    cached_db.fetch_df(QUERY)
+    assert selects(orders) == 2
+
+
+def test_disk_entry_fetched_across_a_write_is_stale(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    df = pd.DataFrame({"id": [1]})
+
+    def fetch():
+        # the table is written while the result is in flight
+        cache.invalidate("orders")
+        return df
+
+    cache.fetch("key", fetch, tables=["orders"])
+    assert cache.get("key") == (False, None)
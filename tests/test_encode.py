@@ -0,0 +1,67 @@
+# *_*coding:utf-8 *_*
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from sqlstar.utils import NULL_LIKE_VALUES, df_to_records, encode_df
+
+
+def frame():
+    return pd.DataFrame({
+        "i": np.array([1, 2, 3], dtype="int64"),
+        "f": [0.5, np.nan, 2.5],
+        "n": pd.array([1, None, 3], dtype="Int64"),
+        "b": [True, False, True],
+        "s": ["a", "NULL", None],
+        "c": pd.Categorical(["x", "y", "x"]),
+        "t": pd.to_datetime(["2024-01-02 03:04:05.123456", None,
+                             "2024-01-03 00:00:00.000000"]),
+        "d": pd.to_timedelta(["1h", "2s", None]),
+    })
+
+
+def test_encode_df_yields_python_values():
+    rows, = encode_df(frame(), NULL_LIKE_VALUES)
+    assert rows == [
+        (1, 0.5, 1, True, "a", "x",
+         datetime.datetime(2024, 1, 2, 3, 4, 5, 123456),
+         datetime.timedelta(hours=1)),
+        (2, None, None, False, None, "y", None, datetime.timedelta(seconds=2)),
+        (3, 2.5, 3, True, None, "x", datetime.datetime(2024, 1, 3), None),
+    ]
+    # no numpy scalars reach the drivers
+    assert [type(value) for value in rows[0]] == [
+        int, float, int, bool, str, str, datetime.datetime, datetime.timedelta
+    ]
+
+
+def test_encode_df_keeps_null_like_strings_without_null_values():
+    rows, = encode_df(frame()[["s"]])
+    assert rows == [("a", ), ("NULL", ), (None, )]
+
+
+def test_encode_df_keeps_timezones():
+    df = pd.DataFrame(
+        {"t": pd.to_datetime(["2024-01-02 03:00"]).tz_localize("UTC")})
+    (value, ), = next(encode_df(df))
+    assert value == datetime.datetime(2024, 1, 2, 3,
+                                      tzinfo=datetime.timezone.utc)
+
+
+def test_encode_df_batches_lazily():
+    df = pd.DataFrame({"a": range(5)})
+    batches = encode_df(df, batch_size=2)
+    assert next(batches) == [(0, ), (1, )]
+    assert list(batches) == [[(2, ), (3, )], [(4, )]]
+
+
+def test_df_to_records_dropna():
+    cols, rows = df_to_records(frame()[["i", "f", "s"]], dropna=True)
+    assert cols == ["i", "f", "s"]
+    assert list(rows) == [(1, 0.5, "a")]
+    cols, rows = df_to_records(frame()[["i", "s"]],
+                               dropna=True,
+                               subset=["i"])
+    # dropna leaves the NULL-like strings as they are
+    assert list(rows) == [(1, "a"), (2, "NULL"), (3, None)]
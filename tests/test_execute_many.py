@@ -0,0 +1,35 @@
+# *_*coding:utf-8 *_*
+import pytest
+
+STATEMENTS = [
+    "INSERT INTO t (a) VALUES (1),(2)",
+    "UPDATE t SET a = 3",
+    ("INSERT INTO t (a, b) VALUES (%s, %s),(%s, %s),(%s, %s)",
+     (1, "x", 2, "y", 3, "z")),
+]
+
+
+@pytest.mark.parametrize("multi_statements", [False, True])
+def test_execute_many_counts_every_statement(database, standin,
+                                             multi_statements):
+    db = database(multi_statements=multi_statements)
+    assert db.execute_many(STATEMENTS) == [2, 0, 3]
+    sent = [query for query in standin.queries if not query.startswith("SEL")]
+    if multi_statements:
+        # one round trip for the whole batch
+        assert len(sent) == 1
+    else:
+        assert len(sent) == 3
+
+
+def test_execute_many_with_a_parameter_sequence(db, standin):
+    counts = db.execute_many("INSERT INTO t (a) VALUES (%s)", [(1, ), (2, )])
+    assert counts == [1, 1]
+    assert standin.queries[-2:] == [
+        "INSERT INTO t (a) VALUES (1)", "INSERT INTO t (a) VALUES (2)"
+    ]
+
+
+def test_execute_many_refuses_params_with_a_list_of_statements(db):
+    with pytest.raises(ValueError):
+        db.execute_many(["UPDATE t SET a = 1"], [(1, )])
@@ -0,0 +1,123 @@
+# *_*coding:utf-8 *_*
+import decimal
+import gzip
+import os
+
+import pyarrow as pa
+import pyarrow.parquet
+import pymysql
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from sqlstar.exporters import get_writer, write_csv
+from sqlstar.testing import StandInCursor
+
+D = decimal.Decimal
+
+
+def failing(batches):
+    yield from batches
+    raise RuntimeError("connection lost")
+
+
+@pytest.mark.parametrize("suffix", ["parquet", "feather", "jsonl", "csv"])
+def test_export_decimal_growing_over_batches(db, standin, tmp_path, suffix):
+    rows = [(D("1.50"), ), (D("123.45"), ), (D("12345.67"), )]
+    standin.result([("amount", FIELD_TYPE.NEWDECIMAL, 9, 2)], rows)
+    fname = str(tmp_path / f"out.{suffix}")
+    result = db.export("SELECT amount FROM t", fname, batch_size=1)
+    assert result.rows == 3
+    if suffix == "parquet":
+        table = pyarrow.parquet.read_table(fname)
+        assert table.column("amount").to_pylist() == [r[0] for r in rows]
+
+
+def test_export_csv_writes_batch_by_batch(db, standin, tmp_path,
+                                          monkeypatch):
+    standin.result([("id", FIELD_TYPE.LONGLONG), ("name", FIELD_TYPE.VARCHAR)],
+                   [(1, "a"), (2, None), (3, "c, d"), (4, "e")])
+    sizes = []
+    fetchmany = StandInCursor.fetchmany
+
+    def recording_fetchmany(self, size=1):
+        sizes.append(size)
+        return fetchmany(self, size)
+
+    monkeypatch.setattr(StandInCursor, "fetchmany", recording_fetchmany)
+    fname = str(tmp_path / "out.csv.gz")
+    result = db.export_csv("SELECT id, name FROM t", fname, batch_size=3)
+    assert sizes == [3, 3, 3]
+    assert (result.rows, result.bytes) == (4, os.path.getsize(fname))
+    with gzip.open(fname, "rt", newline="") as fp:
+        assert fp.read() == 'id,name\r\n1,a\r\n2,\r\n3,"c, d"\r\n4,e\r\n'
+
+
+def test_export_csv_of_an_empty_result_writes_the_header(db, standin,
+                                                         tmp_path):
+    standin.result([("id", FIELD_TYPE.LONGLONG)], [])
+    fname = tmp_path / "out.csv"
+    result = db.export_csv("SELECT id FROM t", str(fname), sep=";")
+    assert result.rows == 0
+    assert fname.read_bytes() == b"id\r\n"
+
+
+def test_failed_export_removes_the_partial_file(tmp_path):
+    fname = str(tmp_path / "out.parquet")
+    batch = pa.RecordBatch.from_pydict({"x": [1, 2]})
+    with pytest.raises(RuntimeError):
+        get_writer(fname).write_batches(failing([batch, batch]))
+    assert not os.path.exists(fname)
+
+
+def test_type_change_after_the_first_batch_is_not_truncated(tmp_path):
+    fname = str(tmp_path / "out.feather")
+    batches = [
+        pa.RecordBatch.from_pydict({"x": [1, 2]}),
+        pa.RecordBatch.from_pydict({"x": [1.5]}),
+    ]
+    with pytest.raises(ValueError, match="Column x changed"):
+        get_writer(fname).write_batches(batches)
+    assert not os.path.exists(fname)
+
+
+def test_failed_csv_export_removes_the_partial_file(tmp_path):
+    fname = str(tmp_path / "out.csv.gz")
+    with pytest.raises(RuntimeError):
+        write_csv(failing([[(1, "a")]]), ["id", "name"], fname)
+    assert not os.path.exists(fname)
+
+
+@pytest.mark.parametrize("method, suffix", [("export", "parquet"),
+                                            ("export", "csv"),
+                                            ("export_csv", "csv"),
+                                            ("export_excel", "xlsx")])
+def test_failed_query_keeps_an_existing_file(db, standin, tmp_path, method,
+                                             suffix):
+    fname = tmp_path / f"out.{suffix}"
+    fname.write_bytes(b"yesterday's export")
+    standin.fail("SELECT amount")
+    with pytest.raises(pymysql.err.OperationalError):
+        getattr(db, method)("SELECT amount FROM t", str(fname))
+    assert fname.read_bytes() == b"yesterday's export"
+
+
+def test_csv_query_failing_on_the_first_batch_keeps_an_existing_file(
+        tmp_path):
+    fname = tmp_path / "out.csv"
+    fname.write_bytes(b"yesterday's export")
+    with pytest.raises(RuntimeError):
+        write_csv(failing([]), ["id", "name"], str(fname))
+    assert fname.read_bytes() == b"yesterday's export"
+
+
+@pytest.mark.parametrize("name, sep", [("out.tsv", "\t"),
+                                       ("out.tsv.gz", "\t"),
+                                       ("out.csv", ",")])
+def test_csv_separator_follows_the_suffix(tmp_path, name, sep):
+    import pyarrow.csv
+    fname = str(tmp_path / name)
+    get_writer(fname).write_batches(
+        [pa.RecordBatch.from_pydict({"x": [1], "y": ["a"]})])
+    table = pyarrow.csv.read_csv(
+        fname, parse_options=pyarrow.csv.ParseOptions(delimiter=sep))
+    assert table.column_names == ["x", "y"]
@@ -0,0 +1,75 @@
+# *_*coding:utf-8 *_*
+import decimal
+import re
+import sys
+import zipfile
+
+import pyarrow as pa
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from sqlstar.exporters import EXCEL_MAX_ROWS, ExcelWriter
+
+D = decimal.Decimal
+
+
+def sheets(fname: str) -> dict:
+    """name of the sheet xml -> (dimension, cell values)"""
+    found = {}
+    with zipfile.ZipFile(fname) as workbook:
+        for name in workbook.namelist():
+            if name.startswith("xl/worksheets/sheet"):
+                xml = workbook.read(name).decode("utf-8")
+                found[name.rsplit("/", 1)[1]] = (
+                    re.search(r'<dimension ref="([^"]+)"', xml).group(1),
+                    re.findall(r"<v>([^<]*)</v>", xml))
+    return found
+
+
+def test_export_excel_decimals(db, standin, tmp_path):
+    standin.result([("amount", FIELD_TYPE.NEWDECIMAL, 9, 2)],
+                   [(D("1.50"), ), (D("12345.67"), )])
+    fname = str(tmp_path / "out.xlsx")
+    result = db.export_excel("SELECT amount FROM t", fname, batch_size=1)
+    assert result.rows == 2
+    assert sheets(fname)["sheet1.xml"] == ("A1:A3", ["1.50", "12345.67"])
+
+
+def test_sheet_rolls_over_at_the_excel_row_limit(tmp_path):
+    fname = str(tmp_path / "big.xlsx")
+    rows = EXCEL_MAX_ROWS  # one more than a sheet holds under its header
+    batches = (pa.RecordBatch.from_pydict(
+        {"x": pa.array(range(start, min(start + 200000, rows)))})
+               for start in range(0, rows, 200000))
+    result = ExcelWriter(fname).write_batches(batches)
+    assert result.rows == rows
+    found = sheets(fname)
+    assert found["sheet1.xml"][0] == f"A1:A{EXCEL_MAX_ROWS}"
+    assert found["sheet2.xml"] == ("A1:A2", [str(rows - 1)])
+
+
+def test_sheet_rows_option(tmp_path):
+    fname = str(tmp_path / "small.xlsx")
+    batch = pa.RecordBatch.from_pydict({"x": [1, 2, 3, 4, 5]})
+    ExcelWriter(fname, sheet_rows=2).write_batches([batch])
+    assert [dimension for dimension, _ in sheets(fname).values()] == \
+        ["A1:A3", "A1:A3", "A1:A2"]
+
+
+@pytest.mark.parametrize("sheet_rows", [0, -1, EXCEL_MAX_ROWS])
+def test_sheet_rows_out_of_range(db, standin, tmp_path, sheet_rows):
+    fname = tmp_path / "out.xlsx"
+    with pytest.raises(ValueError, match="sheet_rows must be between 1"):
+        db.export_excel("SELECT x FROM t", str(fname), sheet_rows=sheet_rows)
+    # refused before the query runs
+    assert not any(query.startswith("SELECT x") for query in standin.queries)
+    assert not fname.exists()
+
+
+def test_missing_xlsxwriter_names_the_extra(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "xlsxwriter", None)
+    fname = tmp_path / "out.xlsx"
+    batch = pa.RecordBatch.from_pydict({"x": [1]})
+    with pytest.raises(ImportError, match=r"pip install sqlstar\[excel\]"):
+        ExcelWriter(str(fname)).write_batches([batch])
+    assert not fname.exists()
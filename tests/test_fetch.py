@@ -0,0 +1,82 @@
+# *_*coding:utf-8 *_*
+import pymysql
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from sqlstar.testing import StandInConnection, StandInCursor
+
+ROWS = [(i, f"name {i}") for i in range(10)]
+
+
+@pytest.fixture
+def fetches(standin, monkeypatch):
+    """Cursor classes asked for and the sizes passed to fetchmany"""
+    standin.result([("id", FIELD_TYPE.LONGLONG), ("name", FIELD_TYPE.VARCHAR)],
+                   ROWS)
+    calls = {"cursors": [], "sizes": []}
+    cursor, fetchmany = StandInConnection.cursor, StandInCursor.fetchmany
+
+    def recording_cursor(self, cursor_class=None):
+        calls["cursors"].append(cursor_class)
+        return cursor(self, cursor_class)
+
+    def recording_fetchmany(self, size=1):
+        calls["sizes"].append(size)
+        return fetchmany(self, size)
+
+    monkeypatch.setattr(StandInConnection, "cursor", recording_cursor)
+    monkeypatch.setattr(StandInCursor, "fetchmany", recording_fetchmany)
+    return calls
+
+
+def test_iterate_fetches_batches_from_a_server_side_cursor(db, fetches):
+    assert list(db.iterate("SELECT id, name FROM t", batch_size=4)) == ROWS
+    assert fetches["cursors"] == [pymysql.cursors.SSCursor]
+    assert fetches["sizes"] == [4, 4, 4, 4]
+
+
+def test_iterate_holds_the_connection_until_closed(db, fetches):
+    rows = db.iterate("SELECT id, name FROM t", batch_size=4)
+    assert next(rows) == ROWS[0]
+    # only the first batch was read
+    assert fetches["sizes"] == [4]
+    assert db.pool_stats()["pool_available"] == 0
+    rows.close()
+    assert db.pool_stats()["pool_available"] == 1
+
+
+def test_iterate_binds_params(db, standin, fetches):
+    list(db.iterate("SELECT id, name FROM t WHERE name = %s",
+                    params=("it's", )))
+    assert standin.queries[-1] == \
+        "SELECT id, name FROM t WHERE name = 'it\\'s'"
+
+
+def test_fetch_df_chunks_share_the_description_dtypes(db, standin, fetches):
+    standin.result([("id", FIELD_TYPE.LONGLONG), ("score", FIELD_TYPE.DOUBLE)],
+                   [(1, 0.5), (2, 1.5), (None, None), (4, 2.5), (5, 3.5)])
+    chunks = db.fetch_df("SELECT id, score FROM t", chunksize=2)
+    frames = list(chunks)
+    assert [len(df) for df in frames] == [2, 2, 1]
+    for df in frames:
+        assert dict(df.dtypes.astype(str)) == {
+            "id": "Int64",
+            "score": "float64"
+        }
+    assert fetches["cursors"] == [pymysql.cursors.SSCursor]
+
+
+def test_fetch_df_iter_dtype_overrides_the_description(db, fetches):
+    frames = list(db.fetch_df_iter("SELECT id, name FROM t",
+                                   chunksize=6,
+                                   dtype={"id": "float64"}))
+    assert [len(df) for df in frames] == [6, 4]
+    assert str(frames[0]["id"].dtype) == "float64"
+
+
+def test_fetch_df_iter_of_an_empty_result(db, standin, fetches):
+    standin.result([("id", FIELD_TYPE.LONGLONG)], [])
+    frames = list(db.fetch_df_iter("SELECT id FROM t"))
+    assert len(frames) == 1
+    assert frames[0].empty and list(frames[0].columns) == ["id"]
+    assert str(frames[0]["id"].dtype) == "Int64"
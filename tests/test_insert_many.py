@@ -0,0 +1,93 @@
+# *_*coding:utf-8 *_*
+import re
+
+import pymysql
+import pytest
+
+from sqlstar.backends.mysql import PACKET_OVERHEAD
+
+LIMIT = PACKET_OVERHEAD + 300
+ROWS = [(i, f"row {i:03}") for i in range(100)]
+
+
+@pytest.fixture
+def small_packets(standin):
+    standin.max_allowed_packet = LIMIT
+    return standin
+
+
+def sent(standin, command="INSERT"):
+    return [query for query in standin.queries if query.startswith(command)]
+
+
+def test_insert_many_stays_within_max_allowed_packet(db, small_packets):
+    assert db.insert_many("t", ROWS, ["a", "b"]) == len(ROWS)
+    statements = sent(small_packets)
+    assert len(statements) > 1
+    assert all(
+        len(statement) <= LIMIT - PACKET_OVERHEAD for statement in statements)
+    # every row is sent once, in order
+    keys = [
+        int(key) for statement in statements
+        for key in re.findall(r"\((\d+),'row", statement)
+    ]
+    assert keys == [key for key, _ in ROWS]
+
+
+def test_max_allowed_packet_is_read_once_per_connection(db, small_packets):
+    db.insert_many("t", ROWS, ["a", "b"])
+    db.insert_many("t", ROWS, ["a", "b"])
+    assert small_packets.queries.count("SELECT @@max_allowed_packet") == 1
+
+
+def test_max_batch_bytes_caps_the_statements(db, small_packets):
+    db.insert_many("t", ROWS, ["a", "b"], max_batch_bytes=150)
+    statements = sent(small_packets)
+    assert all(len(statement) <= 150 for statement in statements)
+    assert sum(statement.count("),(") + 1
+               for statement in statements) == len(ROWS)
+
+
+def test_a_row_larger_than_the_limit_goes_alone(db, small_packets):
+    rows = [(1, "a"), (2, "x" * LIMIT), (3, "c")]
+    with pytest.raises(pymysql.err.OperationalError) as error:
+        db.insert_many("t", rows, ["a", "b"])
+    assert error.value.args[0] == 1153
+    first, oversized = sent(small_packets)
+    assert "(1,'a')" in first and "(2," not in first
+    assert oversized.count("),(") == 0
+
+
+def test_execute_many_packs_statements_into_packets(database, small_packets):
+    db = database(multi_statements=True)
+    statements = [f"UPDATE t SET b = 'row {i:03}' WHERE a = {i}"
+                  for i in range(40)]
+    assert db.execute_many(statements) == [0] * 40
+    packets = sent(small_packets, "UPDATE")
+    assert 1 < len(packets) < 40
+    assert all(len(packet) <= LIMIT - PACKET_OVERHEAD for packet in packets)
+    assert ";".join(packets) == ";".join(statements)
+
+
+def test_execute_many_sends_an_oversized_statement_on_its_own(
+        database, small_packets):
+    db = database(multi_statements=True)
+    # over the batch budget, but within the server's limit
+    large = "INSERT INTO t (b) VALUES ('{}')".format("x" * (LIMIT - 100))
+    small = "INSERT INTO t (b) VALUES ('y')"
+    assert db.execute_many([small, large, small]) == [1, 1, 1]
+    packets = sent(small_packets)
+    assert packets == [small, large, small]
+
+
+def test_execute_many_statement_over_the_limit_fails_alone(
+        database, small_packets):
+    db = database(multi_statements=True)
+    large = "INSERT INTO t (b) VALUES ('{}')".format("x" * LIMIT)
+    small = "INSERT INTO t (b) VALUES ('y')"
+    with pytest.raises(pymysql.err.OperationalError) as error:
+        db.execute_many([small, small, large, small])
+    assert error.value.args[0] == 1153
+    packets = sent(small_packets)
+    # the statements before it were sent, those after it were not
+    assert packets == [f"{small};{small}", large]
@@ -0,0 +1,61 @@
+# *_*coding:utf-8 *_*
+import datetime
+import os
+
+import pandas as pd
+import pymysql
+import pytest
+
+from sqlstar.utils import load_data_field
+
+
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({"id": [1, 2], "name": ["a", "b"]})
+
+
+def statements(standin) -> list:
+    return [" ".join(q.split()) for q in standin.queries]
+
+
+def test_load_upserts_through_a_stage_like_insert(db, standin):
+    db.insert_df("t", frame(), method="load")
+    sent = statements(standin)
+    load = next(q for q in sent if q.startswith("LOAD DATA"))
+    assert "REPLACE" not in load
+    assert "INTO TABLE `sqlstar_load_stage`" in load
+    assert ("INSERT INTO t (`id`, `name`) SELECT `id`, `name` FROM "
+            "`sqlstar_load_stage` ON DUPLICATE KEY UPDATE "
+            "`id` = VALUES(`id`), `name` = VALUES(`name`)") in sent
+    assert sent[-1] == "DROP TEMPORARY TABLE IF EXISTS `sqlstar_load_stage`"
+
+
+@pytest.mark.parametrize("duplicate", ["replace", "ignore"])
+def test_load_straight_into_the_table(db, standin, duplicate):
+    db.insert_df("t", frame(), method="load", duplicate=duplicate)
+    load = next(q for q in statements(standin) if q.startswith("LOAD DATA"))
+    assert f"{duplicate.upper()} INTO TABLE t" in load
+    assert not any("sqlstar_load_stage" in q for q in statements(standin))
+
+
+def test_failed_load_drops_the_stage_and_the_file(db, standin):
+    standin.fail("LOAD DATA")
+    with pytest.raises(pymysql.err.OperationalError):
+        db.insert_df("t", frame(), method="load")
+    load = next(q for q in standin.queries if "LOAD DATA" in q)
+    assert not os.path.exists(load.split("'")[1])
+    assert statements(standin)[-1] == \
+        "DROP TEMPORARY TABLE IF EXISTS `sqlstar_load_stage`"
+
+
+@pytest.mark.parametrize("value", [
+    pd.Timestamp("2024-01-01 08:00:00", tz="Asia/Shanghai"),
+    datetime.datetime(2024, 1, 1, 1, tzinfo=datetime.timezone(
+        datetime.timedelta(hours=1))),
+])
+def test_aware_datetimes_are_written_as_naive_utc(value):
+    assert load_data_field(value) == "2024-01-01 00:00:00"
+
+
+def test_naive_datetimes_are_kept():
+    assert load_data_field(datetime.datetime(2024, 1, 1, 8)) == \
+        "2024-01-01 08:00:00"
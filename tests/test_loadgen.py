@@ -0,0 +1,58 @@
+# *_*coding:utf-8 *_*
+import random
+
+from click.testing import CliRunner
+
+from sqlstar import loadgen
+from sqlstar.cmdline import cli
+
+from conftest import URL
+
+STATEMENTS = ["SELECT 1", "SELECT 2", "UPDATE t SET a = 1", "SELECT 3"]
+
+
+def query_file(tmp_path):
+    path = tmp_path / "queries.sql"
+    path.write_text(";\n".join(STATEMENTS) + ";\n", encoding="utf-8")
+    return loadgen.QueryFile(str(path))
+
+
+def test_query_file_workers_keep_their_own_turn(tmp_path):
+    load = query_file(tmp_path)
+    workers = [load.operations(random.Random(seed)) for seed in range(4)]
+    runs = [[] for _ in workers]
+    for _ in range(2 * len(STATEMENTS)):
+        for operations, ran in zip(workers, runs):
+            ran.append(next(operations)[1][0])
+    for ran in runs:
+        start = STATEMENTS.index(ran[0])
+        assert ran == [
+            STATEMENTS[(start + i) % len(STATEMENTS)]
+            for i in range(len(ran))
+        ]
+
+
+def test_query_file_on_threads(standin, tmp_path):
+    report = loadgen.run(URL,
+                         query_file(tmp_path),
+                         concurrency=4,
+                         duration=None,
+                         requests=32,
+                         prepare=False)
+    summary = report.summary()
+    assert summary["requests"] == 32 and summary["errors"] == 0
+    # every worker ran the file twice, whatever statement it started on
+    for statement in STATEMENTS:
+        assert standin.queries.count(statement) == 8
+
+
+def test_cleanup_drops_the_table(db, standin):
+    loadgen.PointLookups("lookups").cleanup(db)
+    assert "DROP TABLE IF EXISTS lookups" in standin.queries
+
+
+def test_bench_fails_when_the_server_is_unreachable():
+    result = CliRunner().invoke(
+        cli, ["bench", "mysql://root@127.0.0.1:1/x", "-n", "2"])
+    assert result.exit_code == 1
+    assert "Can't connect" in result.output
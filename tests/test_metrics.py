@@ -0,0 +1,86 @@
+# *_*coding:utf-8 *_*
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from sqlstar.metrics import InstrumentedConnection, Observer
+
+
+class Recorder(Observer):
+
+    def __init__(self):
+        self.events = []
+
+    def on_query(self, event):
+        self.events.append(event)
+
+
+@pytest.fixture
+def metered(database, standin):
+    standin.result([("id", FIELD_TYPE.LONGLONG)], [(1, ), (2, ), (3, )])
+    return database(metrics=True)
+
+
+def test_metrics_count_calls_rows_and_errors(metered, standin):
+    metered.fetch_all("SELECT id FROM orders")
+    metered.fetch_all("SELECT id FROM orders WHERE id > %s", (1, ))
+    assert list(metered.iterate("SELECT id FROM users")) == [(1, ), (2, ),
+                                                             (3, )]
+    metered.insert_many("orders", [(1, "a"), (2, "b")], ["id", "name"])
+    standin.fail("DELETE")
+    with pytest.raises(Exception):
+        metered.execute("DELETE FROM orders")
+    snapshot = metered.metrics()
+    orders = snapshot["fetch_all"]["orders"]
+    assert (orders["count"], orders["rows"], orders["errors"]) == (2, 6, 0)
+    assert orders["bytes"] > 0
+    assert snapshot["iterate"]["users"]["rows"] == 3
+    # rows sent rather than affected
+    assert snapshot["insert_many"]["orders"]["rows"] == 2
+    assert snapshot["execute"]["orders"]["errors"] == 1
+    assert snapshot["pool_wait"]["count"] == 5
+
+
+def test_metrics_in_the_prometheus_format(metered):
+    metered.fetch_all("SELECT id FROM orders")
+    text = metered.metrics("prometheus")
+    assert ('sqlstar_query_duration_seconds_count{operation="fetch_all",'
+            'table="orders"} 1') in text
+    assert ('sqlstar_query_rows_total{operation="fetch_all",'
+            'table="orders"} 3') in text
+    assert "sqlstar_pool_wait_seconds_count 1" in text
+
+
+def test_backend_connection_is_not_wrapped_without_observers(db):
+    connection = db.connection()
+    with connection:
+        assert not isinstance(connection._connection, InstrumentedConnection)
+    recorder = Recorder()
+    db.observers.append(recorder)
+    # observers added later apply from the next checkout
+    with connection:
+        assert isinstance(connection._connection, InstrumentedConnection)
+        connection.fetch_all("SELECT 1")
+    db.observers.remove(recorder)
+    db.fetch_all("SELECT 2")
+    assert [event.query for event in recorder.events] == ["SELECT 1"]
+
+
+class Backend:
+
+    def fetch_all(self, query, params=None, prepare=False):
+        return [(1, )]
+
+    def insert_many(self, table, data, cols):
+        return 0
+
+
+def test_keyword_arguments_are_observed():
+    recorder = Recorder()
+    connection = InstrumentedConnection(Backend(), [recorder])
+    connection.fetch_all(query="SELECT * FROM orders", params=(1, ))
+    connection.insert_many(table="orders", data=[(1, ), (2, )], cols=["id"])
+    fetch, insert = recorder.events
+    assert (fetch.query, fetch.params, fetch.table) == ("SELECT * FROM orders",
+                                                        (1, ), "orders")
+    assert (insert.table, insert.rows) == ("orders", 2)
+
@@ -0,0 +1,100 @@
+# *_*coding:utf-8 *_*
+import time
+
+import pandas as pd
+import pytest
+
+from sqlstar.core import PartitionError
+
+
+def frame(rows: int = 100) -> pd.DataFrame:
+    return pd.DataFrame({
+        "id": range(rows),
+        "name": [f"name{i}" for i in range(rows)],
+    })
+
+
+def test_partitions_cover_every_row(database, standin):
+    db = database(max_size=4)
+    db.insert_df("t", frame(), workers=4)
+    inserts = [q for q in standin.queries if q.startswith("INSERT")]
+    assert len(inserts) == 4
+    assert sum(q.count("),(") + 1 for q in inserts) == 100
+
+
+def test_atomic_commits_every_partition(database, standin):
+    db = database(max_size=4)
+    db.insert_df("t", frame(), workers=4, atomic=True)
+    assert standin.commits == 4
+    assert standin.rollbacks == 0
+
+
+def test_atomic_with_fewer_free_connections_than_workers(database, standin):
+    db = database(max_size=3, timeout=30)
+    started = time.monotonic()
+    db.insert_df("t", frame(), workers=4, atomic=True)
+    # used to wait at the barrier until the pool timed out
+    assert time.monotonic() - started < 5
+    assert standin.commits == 3
+    assert db.pool_stats()["pool_size"] == db.pool_stats()["pool_available"]
+
+
+def test_atomic_rolls_back_every_partition_on_failure(database, standin):
+    db = database(max_size=4)
+    df = frame()
+    df.loc[60, "name"] = "boom"
+    standin.fail("boom")
+    with pytest.raises(PartitionError) as info:
+        db.insert_df("t", df, workers=4, atomic=True)
+    assert info.value.rolled_back
+    assert list(info.value.errors) == [(50, 75)]
+    assert standin.commits == 0
+    assert standin.rollbacks == 4
+
+
+def test_failed_commit_after_others_is_not_reported_as_rolled_back(
+        database, standin):
+    db = database(max_size=4)
+    standin.fail_commit(2)
+    with pytest.raises(PartitionError) as info:
+        db.insert_df("t", frame(), workers=4, atomic=True)
+    assert not info.value.rolled_back
+    assert len(info.value.errors) == 1
+    assert len(info.value.committed) == standin.commits >= 1
+    assert "all rolled back" not in str(info.value)
+    assert "committed rows" in str(info.value)
+
+
+def test_non_atomic_failure_names_the_written_partitions(database, standin):
+    db = database(max_size=4)
+    df = frame()
+    df.loc[60, "name"] = "boom"
+    standin.fail("boom")
+    with pytest.raises(PartitionError) as info:
+        db.insert_df("t", df, workers=4)
+    assert not info.value.rolled_back
+    assert info.value.committed == [(0, 25), (25, 50), (75, 100)]
+
+
+def test_atomic_fails_fast_when_connections_are_unavailable(
+        database, standin):
+    db = database(max_size=2, timeout=0.2)
+    held = [db._make_connection() for _ in range(2)]
+    for connection in held:
+        connection.__enter__()
+    try:
+        with pytest.raises(Exception, match="nothing was written"):
+            db.insert_df("t", frame(), workers=2, atomic=True)
+    finally:
+        for connection in held:
+            connection.__exit__(None, None, None)
+    assert not any(q.startswith("INSERT") for q in standin.queries)
+
+
+def test_connection_left_in_a_transaction_is_not_reused(db):
+    with pytest.raises(RuntimeError):
+        with db.connection() as connection:
+            connection.begin()
+            raise RuntimeError("job failed")
+    stats = db.pool_stats()
+    assert stats["pool_size"] == stats["pool_available"] == 0
@@ -0,0 +1,40 @@
+# *_*coding:utf-8 *_*
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+QUOTED = "O'Brien\"; DROP TABLE t; --"
+
+
+def test_fetch_all_binds_sequences_and_dicts(db, standin):
+    db.fetch_all("SELECT id FROM t WHERE name = %s AND id > %s",
+                 (QUOTED, 3))
+    db.fetch_all("SELECT id FROM t WHERE name = %(name)s", {"name": QUOTED})
+    assert standin.queries[-2:] == [
+        "SELECT id FROM t WHERE name = 'O\\'Brien\\\"; DROP TABLE t; --' "
+        "AND id > 3",
+        "SELECT id FROM t WHERE name = 'O\\'Brien\\\"; DROP TABLE t; --'",
+    ]
+
+
+def test_fetch_df_and_execute_bind_params(db, standin):
+    standin.result([("id", FIELD_TYPE.LONGLONG)], [(1, )])
+    df = db.fetch_df("SELECT id FROM t WHERE name = %s", params=(QUOTED, ))
+    assert df["id"].tolist() == [1]
+    db.execute("DELETE FROM t WHERE name = %s", (QUOTED, ))
+    assert standin.queries[-2:] == [
+        "SELECT id FROM t WHERE name = 'O\\'Brien\\\"; DROP TABLE t; --'",
+        "DELETE FROM t WHERE name = 'O\\'Brien\\\"; DROP TABLE t; --'",
+    ]
+
+
+def test_update_binds_the_values(db, standin):
+    db.update("t", where={"id": 1, "name": None}, target={"name": QUOTED})
+    assert " ".join(standin.queries[-1].split()) == (
+        "UPDATE t SET `name` = 'O\\'Brien\\\"; DROP TABLE t; --' "
+        "WHERE `id` = 1 AND `name` IS NULL")
+
+
+def test_update_without_a_where_condition(db, standin):
+    with pytest.raises(ValueError, match="where condition"):
+        db.update("t", where={}, target={"name": "x"})
+    assert not any(query.startswith("UPDATE") for query in standin.queries)
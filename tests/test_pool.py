@@ -0,0 +1,125 @@
+# *_*coding:utf-8 *_*
+import asyncio
+import threading
+import time
+
+import pytest
+
+import sqlstar
+from sqlstar.pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
+
+from conftest import URL
+
+
+def hold(db):
+    """Check a pooled connection out of `db` until its __exit__"""
+    connection = db._make_connection()
+    connection.__enter__()
+    return connection
+
+
+def test_options_from_the_url_and_database(standin):
+    db = sqlstar.Database(URL + "?min_size=2&max_size=5&timeout=1",
+                          max_size=3)
+    db.connect()
+    try:
+        stats = db.pool_stats()
+        assert (stats["pool_min"], stats["pool_max"]) == (2, 3)
+        assert stats["pool_size"] == stats["pool_available"] == 2
+        assert db._backend._pool.timeout == 1.0
+    finally:
+        db.disconnect()
+
+
+def test_connections_are_reused(db):
+    for _ in range(5):
+        db.fetch_all("SELECT 1")
+    stats = db.pool_stats()
+    assert stats["connections_num"] == 1
+    assert stats["requests_num"] == 5
+
+
+def test_acquire_times_out_when_the_pool_is_exhausted(database):
+    db = database(max_size=1, timeout=0.2)
+    held = hold(db)
+    try:
+        started = time.monotonic()
+        with pytest.raises(PoolTimeout):
+            db.fetch_all("SELECT 1")
+        assert time.monotonic() - started >= 0.2
+    finally:
+        held.__exit__(None, None, None)
+    assert db.pool_stats()["requests_errors"] == 1
+    db.fetch_all("SELECT 1")
+
+
+def test_waiter_gets_the_released_connection(database):
+    db = database(max_size=1, timeout=5)
+    held = hold(db)
+    release = threading.Timer(0.1, held.__exit__, (None, None, None))
+    release.start()
+    try:
+        db.fetch_all("SELECT 1")
+    finally:
+        release.join()
+    stats = db.pool_stats()
+    assert stats["requests_queued"] == 1
+    assert stats["connections_num"] == 1
+
+
+def test_broken_connection_is_replaced(database):
+    db = database(ping_interval=0)
+    db.fetch_all("SELECT 1")
+    db._backend._pool._idle[-1].connection.close()
+    db.fetch_all("SELECT 1")
+    stats = db.pool_stats()
+    assert stats["connections_lost"] == 1
+    assert stats["connections_num"] == 2
+
+
+def test_expired_connection_is_not_reused(database):
+    db = database(min_size=0, max_lifetime=0)
+    db.fetch_all("SELECT 1")
+    db.fetch_all("SELECT 1")
+    stats = db.pool_stats()
+    assert stats["connections_num"] == 2
+    assert stats["pool_size"] == 0
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        ConnectionPool(object, min_size=3, max_size=2)
+    with pytest.raises(ValueError):
+        AsyncConnectionPool(object, max_size=0)
+
+
+def test_release_of_a_foreign_connection():
+    pool = ConnectionPool(object, min_size=0)
+    pool.open()
+    with pytest.raises(ValueError):
+        pool.release(object())
+
+
+def test_async_acquire_times_out_and_wakes_up():
+
+    async def connect():
+        return object()
+
+    async def scenario():
+        pool = AsyncConnectionPool(connect, min_size=0, max_size=1,
+                                   timeout=0.1)
+        await pool.open()
+        connection = await pool.acquire()
+        with pytest.raises(PoolTimeout):
+            await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire(timeout=5))
+        await asyncio.sleep(0.05)
+        await pool.release(connection)
+        assert await waiter is connection
+        stats = pool.get_stats()
+        assert stats["requests_errors"] == 1
+        assert stats["requests_queued"] == 2
+        assert stats["connections_num"] == 1
+        await pool.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,313 @@
+# *_*coding:utf-8 *_*
+"""PostgreBackend against a fake psycopg connection, there is no server"""
+import collections
+import contextlib
+import gzip
+import threading
+
+import pandas as pd
+import psycopg
+import pytest
+
+import sqlstar
+from sqlstar.backends import postgre
+from sqlstar.backends.postgre import PostgreConnection
+
+URL = "postgre://test@fake:5432/test"
+
+Column = collections.namedtuple("Column", "name type_code")
+
+IDLE = psycopg.pq.TransactionStatus.IDLE
+INTRANS = psycopg.pq.TransactionStatus.INTRANS
+
+
+class FakeCursor:
+
+    def __init__(self, connection: "FakeConnection"):
+        self._connection = connection
+        self._rows = []
+        self.rowcount = -1
+        self.description = None
+
+    def execute(self, query, params=None, prepare=None):
+        self._connection.queries.append((query, params))
+        self._rows = list(self._connection.rows)
+        self.rowcount = len(self._rows)
+        self.description = [
+            Column(*column) for column in self._connection.columns
+        ]
+
+    def executemany(self, query, params_seq):
+        params_seq = list(params_seq)
+        self._connection.queries.append((query, params_seq))
+        self.rowcount = len(params_seq)
+
+    def copy(self, statement, params=None):
+        self._connection.queries.append((statement, params))
+        self.rowcount = len(self._connection.rows)
+        return FakeCopy(self._connection)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FakeConnection:
+
+    def __init__(self, server: "FakeServer"):
+        self.queries = []
+        self.rows = server.rows
+        self.columns = server.columns
+        self.copies = server.copies
+        self.copy_data = server.copy_data
+        self.closed = False
+        self.info = type("info", (), {"transaction_status": IDLE})()
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+        if query == "BEGIN":
+            self.info.transaction_status = INTRANS
+        elif query in ("COMMIT", "ROLLBACK"):
+            self.info.transaction_status = IDLE
+
+    @contextlib.contextmanager
+    def pipeline(self):
+        yield self
+
+    def sync(self):
+        self.queries.append(("SYNC", None))
+
+    @contextlib.contextmanager
+    def transaction(self):
+        self.queries.append(("BEGIN", None))
+        yield
+        self.queries.append(("COMMIT", None))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCopy:
+    """COPY FROM STDIN keeping the rows written in the server's `copies`,
+    COPY TO STDOUT sending the server's `copy_data`
+    """
+
+    def __init__(self, connection: FakeConnection):
+        self.types = None
+        self.rows = []
+        self._data = connection.copy_data
+        connection.copies.append(self)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def set_types(self, types):
+        self.types = types
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeServer:
+    """Takes the place of ``psycopg.connect``"""
+
+    def __init__(self):
+        self.rows = [(1, )]
+        self.columns = [("id", 20)]
+        self.copies = []
+        self.copy_data = []
+        self.connections = []
+
+    def connect(self, **kwargs):
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(psycopg, "connect", server.connect)
+    return server
+
+
+@pytest.fixture
+def pg(server):
+    db = sqlstar.Database(URL + "?min_size=0&max_size=2", timeout=1)
+    db.connect()
+    yield db
+    db.disconnect()
+
+
+def test_connections_are_reused(pg, server):
+    for _ in range(3):
+        assert pg.fetch_all("SELECT 1") == [(1, )]
+    stats = pg.pool_stats()
+    assert (stats["pool_min"], stats["pool_max"]) == (0, 2)
+    assert stats["connections_num"] == 1
+    assert stats["requests_num"] == 3
+    assert len(server.connections) == 1
+
+
+def test_threads_check_out_their_own_connection(pg, server):
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with pg.connection():
+            pg.fetch_all("SELECT 'held'")
+            held.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    try:
+        assert held.wait(5)
+        pg.fetch_all("SELECT 'other'")
+    finally:
+        done.set()
+        thread.join()
+    first, second = server.connections
+    assert [query for query, _ in first.queries] == ["SELECT 'held'"]
+    assert [query for query, _ in second.queries] == ["SELECT 'other'"]
+    assert pg.pool_stats()["pool_available"] == 2
+
+
+def test_connection_left_in_a_transaction_is_dropped(pg, server):
+    connection = pg.connection()
+    with connection:
+        connection.begin()
+    assert server.connections[0].closed
+    assert pg.pool_stats()["pool_size"] == 0
+    pg.fetch_all("SELECT 1")
+    assert len(server.connections) == 2
+
+
+def test_large_frames_are_copied(pg, server, monkeypatch):
+    monkeypatch.setattr(postgre, "COPY_THRESHOLD", 3)
+    df = pd.DataFrame({"a": [1, 2, None], "b": ["x", "y", "z"]})
+    pg.insert_df("t", df, dropna=False)
+    statement, _ = server.connections[0].queries[-1]
+    assert statement == "COPY t (a, b) FROM STDIN"
+    copy, = server.copies
+    assert copy.types is None
+    assert copy.rows == [(1.0, "x"), (2.0, "y"), (None, "z")]
+
+
+def test_small_frames_are_inserted(pg, server):
+    pg.insert_df("t", pd.DataFrame({"a": [1, 2]}))
+    statement, params = server.connections[0].queries[-1]
+    assert statement == "INSERT INTO t (a) VALUES (%s)"
+    assert params == [(1, ), (2, )]
+    assert server.copies == []
+
+
+def test_binary_copy_takes_the_column_types(pg, server):
+    pg.insert_df("t", pd.DataFrame({"a": [1, 2]}),
+                 method="copy",
+                 copy_format="binary")
+    queries = [query for query, _ in server.connections[0].queries]
+    assert queries == [
+        "SELECT a FROM t LIMIT 0", "COPY t (a) FROM STDIN (FORMAT BINARY)"
+    ]
+    copy, = server.copies
+    assert copy.types == [20]
+    assert copy.rows == [(1, ), (2, )]
+
+
+def test_unknown_insert_method_and_copy_format(pg):
+    df = pd.DataFrame({"a": [1]})
+    with pytest.raises(ValueError):
+        pg.insert_df("t", df, method="load")
+    with pytest.raises(ValueError):
+        pg.insert_df("t", df, method="copy", copy_format="csv")
+
+
+def test_export_csv_copies_a_select_to_stdout(pg, server, tmp_path):
+    server.rows[:] = [(1, "a"), (2, "b")]
+    server.copy_data[:] = [b"id;name\n", b"1;a\n", b"2;b\n"]
+    fname = str(tmp_path / "out.csv.gz")
+    result = pg.export_csv("SELECT id, name FROM t WHERE id > %s;\n",
+                           fname,
+                           sep=";",
+                           params=(0, ))
+    statement, params = server.connections[0].queries[-1]
+    assert statement.as_string(None) == (
+        "COPY (SELECT id, name FROM t WHERE id > %s) "
+        "TO STDOUT WITH (FORMAT CSV, HEADER, DELIMITER ';')")
+    assert params == (0, )
+    assert result.rows == 2
+    with gzip.open(fname, "rb") as fp:
+        assert fp.read() == b"id;name\n1;a\n2;b\n"
+
+
+def test_export_csv_without_copy_reads_a_server_cursor(pg, server, tmp_path):
+    server.rows[:] = [(1, ), (2, )]
+    fname = tmp_path / "out.csv"
+    result = pg.export_csv("(SELECT id FROM t)", str(fname))
+    assert result.rows == 2
+    assert server.copies == []
+    assert [query for query, _ in server.connections[0].queries
+            ] == ["BEGIN", "(SELECT id FROM t)", "COMMIT"]
+    assert fname.read_bytes() == b"id\r\n1\r\n2\r\n"
+
+
+@pytest.mark.parametrize("query, copied", [
+    ("SELECT 1;", "SELECT 1"),
+    (" with x as (SELECT 1) SELECT * FROM x", "with x as (SELECT 1) "
+     "SELECT * FROM x"),
+    ("TABLE t", "TABLE t"),
+    ("VALUES (1)", "VALUES (1)"),
+    ("SELECT 1; SELECT 2", None),
+    ("UPDATE t SET a = 1 RETURNING a", None),
+])
+def test_copyable_query(query, copied):
+    assert PostgreConnection._copyable_query(query) == copied
+
+
+def test_update_binds_the_values(pg, server):
+    pg.update("t", where={"id": 1, "name": None}, target={"name": "O'Brien"})
+    statement, params = server.connections[0].queries[-1]
+    assert statement.as_string(None) == \
+        'UPDATE t SET "name" = %s WHERE "id" = %s AND "name" IS NULL'
+    assert params == ["O'Brien", 1]
+    with pytest.raises(ValueError, match="where condition"):
+        pg.update("t", where={}, target={"name": "x"})
+
+
+def test_execute_many_syncs_the_pipeline_per_batch(pg, server):
+    server.rows[:] = [(1, ), (2, )]
+    counts = pg.execute_many(
+        ["DELETE FROM a", ("DELETE FROM b WHERE id = %s", (1, )),
+         "DELETE FROM c"],
+        batch_size=2)
+    assert counts == [2, 2, 2]
+    assert server.connections[0].queries == [
+        ("DELETE FROM a", None),
+        ("DELETE FROM b WHERE id = %s", (1, )),
+        ("SYNC", None),
+        ("DELETE FROM c", None),
+        ("SYNC", None),
+    ]
@@ -0,0 +1,74 @@
+# *_*coding:utf-8 *_*
+import time
+
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from sqlstar.testing import StandInCursor
+
+SLOW = "SELECT id FROM orders WHERE pg_sleep"
+
+
+@pytest.fixture
+def slow_server(standin, monkeypatch):
+    """Statements containing `SLOW` take 50ms on the stand-in"""
+    standin.result([("id", FIELD_TYPE.LONGLONG)], [(i, ) for i in range(500)])
+    execute = StandInCursor.execute
+
+    def sleeping_execute(self, query, args=None):
+        if SLOW in query and not query.startswith("EXPLAIN"):
+            time.sleep(0.05)
+        return execute(self, query, args)
+
+    monkeypatch.setattr(StandInCursor, "execute", sleeping_execute)
+    return standin
+
+
+def test_profile_splits_wall_time_into_driver_and_decode(db, slow_server):
+    with db.profile(explain=False) as prof:
+        db.fetch_all(SLOW)
+        frames = list(db.fetch_df_iter("SELECT id FROM users", chunksize=100))
+    assert len(frames) == 5
+    fetch, fetch_df = prof.statements
+    assert fetch.operation == "fetch_all"
+    assert fetch.driver >= 0.05 and fetch.decode == 0
+    assert fetch_df.rows == 500
+    assert 0 < fetch_df.decode <= fetch_df.wall
+    assert fetch_df.driver == pytest.approx(fetch_df.wall - fetch_df.decode)
+    assert prof not in db.observers
+
+
+def test_slow_statements_are_explained_once(db, slow_server):
+    with db.profile(threshold=0.04) as prof:
+        db.fetch_all(SLOW)
+        db.fetch_all(SLOW)
+        db.fetch_all("SELECT id FROM users")
+    explained = [q for q in slow_server.queries if q.startswith("EXPLAIN")]
+    assert explained == [f"EXPLAIN {SLOW}"]
+    assert [s.query for s in prof.slow()] == [SLOW, SLOW]
+    first, second = prof.ranked()
+    assert (first["statement"], first["count"]) == (SLOW, 2)
+    assert first["wall"] >= 0.1
+    assert (second["count"], second["rows"]) == (1, 500)
+
+
+def test_report_ranks_statements_and_counts_errors(db, slow_server):
+    slow_server.fail("broken")
+    with db.profile(explain=False) as prof:
+        db.fetch_all(SLOW)
+        with pytest.raises(Exception):
+            db.execute("UPDATE broken SET a = 1")
+    lines = prof.report().splitlines()
+    assert lines[0].startswith("2 statements")
+    assert lines[2].endswith(f"fetch_all           {SLOW}")
+    assert lines[3].endswith("execute             UPDATE broken SET a = 1")
+    assert lines[4].strip() == "1 failed"
+
+
+def test_profile_with_cprofile(db, slow_server, tmp_path):
+    path = str(tmp_path / "job.prof")
+    with db.profile(explain=False, cprofile=path) as prof:
+        db.fetch_all("SELECT id FROM users")
+    assert prof.stats is not None
+    assert "python side:" in prof.report()
+    assert (tmp_path / "job.prof").exists()
@@ -0,0 +1,88 @@
+# *_*coding:utf-8 *_*
+import json
+import random
+
+import pytest
+
+from sqlstar.metrics import QueryEvent
+from sqlstar.slowlog import SlowQueryLog, fingerprint, fingerprint_id
+
+
+@pytest.mark.parametrize("query, text", [
+    ("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'x'",
+     "select * from t where id in (?+) and name = ?"),
+    ("select *\n  from t where id = -1.5e3;", "select * from t where id = ?"),
+    ("SELECT a FROM t1 WHERE b = 'it''s' -- note", "select a from t1 where "
+     "b = ?"),
+    ("SELECT /* hint */ a FROM t WHERE b = %s AND c = %(c)s AND d = $1",
+     "select a from t where b = ? and c = ? and d = ?"),
+    ("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y')",
+     "insert into t (a, b) values (?+)"),
+    ('SELECT "Col2" FROM t LIMIT 0x10', 'select "col2" from t limit ?'),
+])
+def test_fingerprint(query, text):
+    assert fingerprint(query) == text
+
+
+def event(query, seconds=0.01, **attrs):
+    event = QueryEvent("fetch_all", query, attrs.pop("params", None), "t")
+    event.seconds = seconds
+    for name, value in attrs.items():
+        setattr(event, name, value)
+    return event
+
+
+def test_a_sample_of_the_statements_is_aggregated(monkeypatch):
+    log = SlowQueryLog(sample_rate=0.25)
+    draws = iter([0.1, 0.5, 0.9, 0.2] * 25)
+    monkeypatch.setattr(random, "random", lambda: next(draws))
+    for i in range(100):
+        log.on_query(event(f"SELECT * FROM t WHERE id = {i}", rows=1))
+    digest, = log.top()
+    assert digest["fingerprint"] == "select * from t where id = ?"
+    assert digest["id"] == fingerprint_id(digest["fingerprint"])
+    # the draws under 0.25
+    assert (digest["count"], digest["rows"]) == (50, 50)
+    assert digest["estimated"] == 200
+    assert digest["slow"] == 0
+
+
+def test_slow_statements_are_all_counted_and_logged(tmp_path):
+    path = tmp_path / "logs" / "slow.jsonl"
+    log = SlowQueryLog(str(path), threshold=0.5, sample_rate=0)
+    log.on_query(event("SELECT * FROM t WHERE id = 1", seconds=0.1))
+    log.on_query(event("SELECT * FROM t WHERE id = 2", seconds=0.7,
+                       params=(2, )))
+    log.close()
+    digest, = log.top()
+    assert (digest["count"], digest["slow"], digest["max"]) == (0, 1, 0.7)
+    entry, = [json.loads(line) for line in path.read_text().splitlines()]
+    assert entry["fingerprint"] == "select * from t where id = ?"
+    assert entry["seconds"] == 0.7
+    # parameters may hold personal data
+    assert "params" not in entry and "query" not in entry
+
+
+def test_fingerprints_over_the_limit_share_a_digest():
+    log = SlowQueryLog(sample_rate=1, max_fingerprints=2)
+    for table in ("a", "b", "c", "d"):
+        log.on_query(event(f"SELECT * FROM {table}"))
+    assert sorted(d["fingerprint"] for d in log.top()) == [
+        "<other>", "select * from a", "select * from b"
+    ]
+    assert {d["fingerprint"]: d["count"]
+            for d in log.top()}["<other>"] == 2
+
+
+def test_database_slow_log(database, tmp_path):
+    path = tmp_path / "slow.jsonl"
+    db = database(slow_log=SlowQueryLog(str(path),
+                                        threshold=0,
+                                        sample_rate=1,
+                                        log_params=True))
+    db.fetch_all("SELECT * FROM orders WHERE id = %s", (7, ))
+    db.slow_log.close()
+    entry = json.loads(path.read_text().splitlines()[-1])
+    assert entry["fingerprint"] == "select * from orders where id = ?"
+    assert (entry["operation"], entry["table"]) == ("fetch_all", "orders")
+    assert entry["params"] == [7]